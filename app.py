@@ -4,37 +4,148 @@ Goldfish Web App - Flask Backend
 A web interface for the Rosebud-style journaling assistant with Supabase integration
 """
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, g
-import openai
+from flask.json.provider import JSONProvider
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, g, Response, stream_with_context
 import os
-import json
+import orjson
+from decimal import Decimal
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List
 import uuid
+import hashlib
+import time
 from dotenv import load_dotenv
-from functools import wraps
+from functools import wraps, lru_cache
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import threading
+from cachetools import TTLCache
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Import services
+from services.openai_client import get_openai_client
 from services.auth_service import auth_service
 from services.journal_service import journal_service
 from services.embedding_service import embedding_service
-from services.rag_service import rag_service
 from services.summary_service import summary_service
-from services.agent_service import agent_service
+from services.agent_service import get_agent_service
 from services.nlu_service import nlu_service
 from services.neo4j_service import neo4j_service
+from services.redis_client import get_redis_client
+from services.conversation_store import conversation_store
+from services.tokens import count_message_tokens
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson for jsonify, request bodies and the session cookie"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        # Formatting kwargs such as separators are ignored; orjson output is always compact
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if kwargs.get("sort_keys") else 0)
+        return orjson.dumps(obj, default=self._default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    @staticmethod
+    def _default(obj):
+        if isinstance(obj, Decimal):
+            return str(obj)
+        if hasattr(obj, "__html__"):
+            return str(obj.__html__())
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your-secret-key-here')
 
+# Keep sessions server-side in Redis when configured; otherwise use signed cookies
+redis_client = get_redis_client()
+if redis_client is not None:
+    from flask_session import Session
+    app.config['SESSION_TYPE'] = 'redis'
+    app.config['SESSION_REDIS'] = redis_client
+    app.config['SESSION_USE_SIGNER'] = True
+    Session(app)
+
+def rate_limit_key() -> str:
+    """Rate-limit per user when authenticated, per access token before auth has run,
+    and per client address otherwise"""
+    user = g.get('user')
+    if user:
+        return f"user:{user['id']}"
+    access_token, _ = get_tokens_from_request()
+    if access_token:
+        return "token:" + hashlib.blake2s(str(access_token).encode(), digest_size=16).hexdigest()
+    return get_remote_address()
+
+# Per-user token bucket in front of the OpenAI-backed chat endpoints; shared via
+# Redis across workers when configured, otherwise tracked per process
+limiter = Limiter(
+    key_func=rate_limit_key,
+    app=app,
+    storage_uri=os.getenv('REDIS_URL') if redis_client is not None else 'memory://',
+    strategy='moving-window'
+)
+CHAT_RATE_LIMIT = "1/second;20/minute"
+
+@app.errorhandler(429)
+def rate_limited(e):
+    return jsonify({'error': 'You are sending messages too quickly. Please wait a moment and try again.'}), 429
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Shared pool for overlapping blocking service calls (greenlets under gevent)
+executor = ThreadPoolExecutor(max_workers=32)
+
+# Conversation history bound: messages kept in the session
+MAX_HISTORY_MESSAGES = 20
+
+# Once the raw history grows past this many tokens, older turns are folded into
+# a running summary and only the most recent messages are kept verbatim
+ROLLUP_TOKEN_THRESHOLD = 2000
+ROLLUP_KEEP_MESSAGES = 6
+
+# How much of the latest entry's summary is kept for greeting returning users
+RECENT_ENTRY_SNIPPET_CHARS = 300
+
+# Streamed exchanges the server couldn't record itself are handed to the client as
+# a signed, one-time turn token for /chat/commit, so only replies this server
+# generated can enter the history; tokens expire after this long
+PENDING_TURN_MAX_AGE_SECONDS = 10 * 60
+turn_signer = URLSafeTimedSerializer(app.secret_key, salt="chat-commit")
+
+# Committed turn ids are remembered server-side for as long as their tokens are
+# valid, so a token can't be replayed: in Redis when configured, otherwise per process
+COMMITTED_TURNS_MAX = 10_000
+_committed_turns = TTLCache(maxsize=COMMITTED_TURNS_MAX, ttl=PENDING_TURN_MAX_AGE_SECONDS)
+_committed_turns_lock = threading.Lock()
+
+def claim_turn(user_id: str, turn_id: str) -> bool:
+    """Mark a streamed turn as committed; False if it already was"""
+    if conversation_store.enabled:
+        return conversation_store.claim_turn(user_id, turn_id, PENDING_TURN_MAX_AGE_SECONDS)
+    key = (user_id, turn_id)
+    with _committed_turns_lock:
+        if key in _committed_turns:
+            return False
+        _committed_turns[key] = True
+        return True
+
+def release_turn(user_id: str, turn_id: str):
+    """Forget a claimed turn whose exchange couldn't be recorded, so the client can retry"""
+    if conversation_store.enabled:
+        conversation_store.release_turn(user_id, turn_id)
+        return
+    with _committed_turns_lock:
+        _committed_turns.pop((user_id, turn_id), None)
+
 def get_tokens_from_request():
     """Extract access and refresh tokens from request headers or body"""
     # Try to get from Authorization header first
@@ -93,101 +204,36 @@ def require_auth(f):
                 return jsonify({'error': 'Invalid or expired token'}), 401
             else:
                 return redirect(url_for('login'))
+        g.user = user
         return f(*args, **kwargs)
     return decorated_function
 
-class JournalingAssistant:
-    def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        if not self.api_key:
-            raise ValueError("OpenAI API key required. Set OPENAI_API_KEY environment variable.")
-
-        openai.api_key = self.api_key
-
-        self.system_prompt = """You are **Rosebud**, a gentle, curious, human-feeling journaling companion and conversational guide. Your purpose is to help users reflect safely, explore what matters, notice patterns, and open small doors of insight — always with warmth and respect, never pressure.
-
-**Personality & Tone**
-- Warm, kind, empathetic, curious.
-- Conversational and natural; you speak like someone who's quietly present and listening.
-- Use simple, clear language. Avoid jargon, heavy structure, or didactic tones.
-- Use soft invitations, not commands. E.g. "I'm curious about…," "Would it help…," "You might consider…"
-
-**Behavior & Interaction Style**
-- Begin with a gentle check-in: e.g. "Hi — good to see you. What's on your mind today?"
-- Let the user lead. As they write, you read; then you **weave in** questions or prompts organically, drawing from their words, tone, and emotional cues.
-- Your questions should feel like natural curiosity:
-  > "That phrase caught my attention — what does it bring up for you?"
-  > "When you say X, what does your body feel like?"
-  > "What's under that feeling?"
-- If the user pauses, seems stuck, or invites guidance, you may gently offer a seed question or prompt, but only when it feels supportive and timely.
-- You alternate between listening, reflecting, and nudging deeper — never pushing too much structure.
-- Near the end of a session, offer a soft closing reflection or micro-intention: e.g.
-  > "Before we pause — is there one insight or feeling you'd like to hold onto?"
-  > "Is there one small next step you might carry forward?"
-
-**Memory & Context**
-- If you have access to past user entries, you may lightly reference them (only when it seems helpful).
-  > "I remember you mentioned X some time ago — how is that going lately?"
-- Use memory sparingly; avoid over-referencing so it doesn't feel mechanical.
-
-**Safety & Boundaries**
-- You are *not* a mental health professional. If the user reveals signs of serious distress, self harm, suicidal thoughts, or crisis, respond with empathy, acknowledge your limitation, and encourage them to reach out to a trusted professional or crisis resource.
-- You never shame, judge, or insist.
-- If the user says "I don't know what to write," stay gentle and patient. You might suggest a micro-starter:
-  > "Sometimes naming one word — a feeling or image — is enough to begin. Want to try that together?"
-
-**Example Behaviors**
-- *User:* "I've had a tiring week."
-  *You:* "That sounds heavy. When you say 'tiring,' which parts feel most draining — energy, emotion, expectations?"
-- *User:* Writes a paragraph about stress at work.
-  *You:* "I notice you mention deadlines and feeling under pressure. If you followed one strand of that — say, your relationship with expectations — what might it say to you?"
-- *User:* Seems silent.
-  *You:* "I'm here — whenever you're ready. Sometimes it helps to name one small moment from today, whether hard or minor comfort — want to try that?"
-- *Closing:* "Thank you for sharing. Before we stop, is there one word, image, or intention you'd like to carry forward into tomorrow?"""
-
-    def get_response(self, user_input: str, conversation_history: List[Dict], user_id: str = None) -> str:
-        """Get AI response using OpenAI's API with RAG context"""
+# Open the OpenAI and Supabase connections when a gunicorn worker boots instead of
+# on its first chat turn (see post_worker_init in gunicorn.conf.py); importing this
+# module never runs it. Set GOLDFISH_WARMUP=false to skip
+WARMUP_ON_START = os.getenv("GOLDFISH_WARMUP", "true").lower() == "true"
+WARMUP_TIMEOUT_SECONDS = 5.0
+
+def warmup():
+    """Pay the DNS/TLS handshakes of the shared API clients up front, concurrently
+
+    Neo4j is not probed here: its driver already runs a test query when the
+    service is imported.
+    """
+    started = time.perf_counter()
+    probes = {
+        # Free endpoint on the same pooled client the chat and embedding calls use
+        "openai": executor.submit(lambda: get_openai_client().models.list()),
+        "supabase": executor.submit(
+            lambda: journal_service.client.table("journal_entries").select("id").limit(1).execute()
+        )
+    }
+    for name, future in probes.items():
         try:
-            # Get relevant context from past entries if user is authenticated
-            context = ""
-            if user_id:
-                try:
-                    context_result = rag_service.get_relevant_context(user_id, user_input)
-                    if context_result["success"] and context_result["context"]:
-                        context = context_result["context"]
-                except Exception as e:
-                    logger.warning(f"RAG context retrieval failed: {str(e)}")
-            logger.info(f"RAG context for user_id {user_id}: [{context}]")
-            
-            # Enhance system prompt with context
-            enhanced_prompt = rag_service.enhance_system_prompt(self.system_prompt, context)
-            
-            # Prepare messages for API call
-            messages = [{"role": "system", "content": enhanced_prompt}]
-            messages.extend(conversation_history[-10:])  # Keep last 10 exchanges
-            messages.append({"role": "user", "content": user_input})
-
-            response = openai.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                max_tokens=500,
-                temperature=0.7,
-                frequency_penalty=0.1,
-                presence_penalty=0.1
-            )
-
-            return response.choices[0].message.content.strip()
-
+            future.result(timeout=WARMUP_TIMEOUT_SECONDS)
         except Exception as e:
-            logger.error(f"Get response error: {str(e)}")
-            return f"I'm having trouble connecting right now. Let me try again in a moment. ({str(e)})"
-
-# Global assistant instance
-try:
-    assistant = JournalingAssistant()
-except ValueError as e:
-    assistant = None
-    print(f"Assistant initialization failed: {e}")
+            logger.warning(f"Warmup of {name} failed: {str(e)}")
+    logger.info("Warmup finished, warmup_ms=%.1f", (time.perf_counter() - started) * 1000)
 
 # Authentication Routes
 @app.route('/api/auth/signup', methods=['POST'])
@@ -401,9 +447,175 @@ def new_entry():
     user = auth_service.get_current_user(access_token=access_token, refresh_token=refresh_token)
     return render_template('new-entry.html', user=user)
 
+@lru_cache(maxsize=4)
+def _iso_second(epoch_second: int) -> str:
+    """Format a whole second once; every response within that second reuses it"""
+    return datetime.fromtimestamp(epoch_second).isoformat(timespec='seconds')
+
+def iso_timestamp() -> str:
+    """Local ISO-8601 timestamp with millisecond precision for API responses"""
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    return f"{_iso_second(seconds)}.{nanos // 1_000_000:03d}"
+
+def get_conversation_history(user_id: str) -> List[Dict]:
+    """Get the in-progress conversation, from Redis when configured, else the session"""
+    if conversation_store.enabled:
+        return conversation_store.get_history(user_id)
+    return session.get('conversation_history', [])
+
+def get_running_summary(user_id: str) -> str:
+    """Get the running summary of turns rolled out of the conversation history"""
+    if conversation_store.enabled:
+        return conversation_store.get_summary(user_id)
+    return session.get('running_summary', '')
+
+def get_recent_entry(user_id: str) -> str:
+    """Get a snippet of the user's latest saved entry, for greeting them without a RAG lookup"""
+    if conversation_store.enabled:
+        return conversation_store.get_recent_entry(user_id)
+    return session.get('recent_entry', '')
+
+def remember_recent_entry(user_id: str, summary: str):
+    """Keep a snippet of a just-saved entry for the next greeting"""
+    snippet = summary[:RECENT_ENTRY_SNIPPET_CHARS]
+    if conversation_store.enabled:
+        conversation_store.set_recent_entry(user_id, snippet)
+    else:
+        session['recent_entry'] = snippet
+
+def clear_conversation(user_id: str):
+    """Forget the in-progress conversation and its running summary"""
+    if conversation_store.enabled:
+        conversation_store.clear(user_id)
+        return
+    session['conversation_history'] = []
+    session.pop('running_summary', None)
+    session.modified = True
+
+def record_exchange(user_id: str, user_message: str, ai_response: str):
+    """Append a user/assistant exchange to the conversation history"""
+    if conversation_store.enabled:
+        # RPUSH + LTRIM keeps the MAX_HISTORY_MESSAGES bound server-side
+        history = conversation_store.append_exchange(user_id, user_message, ai_response, MAX_HISTORY_MESSAGES)
+    else:
+        if 'conversation_history' not in session:
+            session['conversation_history'] = []
+
+        history = session['conversation_history']
+        history.append({"role": "user", "content": user_message})
+        history.append({"role": "assistant", "content": ai_response})
+
+        # Keep only the last MAX_HISTORY_MESSAGES to prevent session from growing too large;
+        # trim in place rather than re-assigning a sliced copy
+        if len(history) > MAX_HISTORY_MESSAGES:
+            del history[:-MAX_HISTORY_MESSAGES]
+        session.modified = True
+
+    # Roll older turns into the running summary when the raw history gets long
+    if len(history) > ROLLUP_KEEP_MESSAGES and count_message_tokens(history) > ROLLUP_TOKEN_THRESHOLD:
+        running_summary = summary_service.update_running_summary(
+            get_running_summary(user_id),
+            history[:-ROLLUP_KEEP_MESSAGES]
+        )
+        if running_summary:
+            if conversation_store.enabled:
+                conversation_store.set_summary(user_id, running_summary)
+                conversation_store.keep_latest(user_id, ROLLUP_KEEP_MESSAGES)
+            else:
+                session['running_summary'] = running_summary
+                del history[:-ROLLUP_KEEP_MESSAGES]
+
+def sse_event(payload) -> str:
+    """Format a payload as a server-sent event"""
+    data = payload if isinstance(payload, str) else orjson.dumps(payload).decode()
+    return f"data: {data}\n\n"
+
+def stream_chat_response(result: Dict, user_id: str, user_message: str) -> Response:
+    """
+    Stream an agent result to the client as server-sent events.
+
+    Emits one {"delta": ...} event per token chunk, a final event carrying the
+    full response and metadata, then "[DONE]". With Redis the exchange is
+    recorded as soon as the reply finishes and the final event says
+    "committed"; the session cookie is written before the body streams, so
+    without Redis the final event carries a "turn_token" that the client
+    redeems once via /chat/commit.
+    """
+    def generate():
+        parts = []
+        try:
+            for delta in result['response']:
+                parts.append(delta)
+                yield sse_event({'delta': delta})
+        except Exception as e:
+            logger.error(f"Chat stream error: {str(e)}")
+            yield sse_event({'error': 'Response was interrupted. Please try again.'})
+            return
+
+        ai_response = "".join(parts).strip()
+        committed = False
+        if conversation_store.enabled and ai_response:
+            try:
+                record_exchange(user_id, user_message, ai_response)
+                committed = True
+            except Exception as e:
+                # The client falls back to /chat/commit
+                logger.warning(f"Recording streamed exchange failed: {str(e)}")
+
+        final = {
+            'response': ai_response,
+            'committed': committed,
+            'timestamp': iso_timestamp(),
+            'intent': result.get('intent', 'general'),
+            'context_used': {
+                'rag': result.get('rag_context_used', False),
+                'graph': result.get('graph_context_used', False)
+            }
+        }
+        if ai_response and not committed:
+            final['turn_token'] = turn_signer.dumps({
+                'turn_id': uuid.uuid4().hex,
+                'user_id': user_id,
+                'message': user_message,
+                'response': ai_response
+            })
+        yield sse_event(final)
+        yield sse_event("[DONE]")
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 # API Routes
+@app.route('/chat/commit', methods=['POST'])
+@require_auth
+@limiter.limit(CHAT_RATE_LIMIT)
+def chat_commit():
+    """Record a streamed exchange in the session once the client has received it"""
+    data = request.get_json() or {}
+    try:
+        turn = turn_signer.loads(data.get('turn_token') or '', max_age=PENDING_TURN_MAX_AGE_SECONDS)
+    except BadSignature:
+        # Also covers expired tokens
+        return jsonify({'error': 'Invalid or expired turn'}), 400
+
+    if turn['user_id'] != g.user['id']:
+        return jsonify({'error': 'Invalid or expired turn'}), 400
+
+    if not claim_turn(g.user['id'], turn['turn_id']):
+        return jsonify({'error': 'Turn already committed'}), 409
+
+    try:
+        record_exchange(g.user['id'], turn['message'], turn['response'])
+    except Exception:
+        release_turn(g.user['id'], turn['turn_id'])
+        raise
+    return jsonify({'success': True})
+
 @app.route('/chat', methods=['POST'])
 @require_auth
+@limiter.limit(CHAT_RATE_LIMIT)
 def chat():
     """Handle chat messages with Agent Service (RAG + NLU + GraphRAG)"""
     try:
@@ -415,35 +627,30 @@ def chat():
         if not user_message:
             return jsonify({'error': 'Empty message'}), 400
 
-        # Get or create session conversation history
-        if 'conversation_history' not in session:
-            session['conversation_history'] = []
+        wants_stream = 'text/event-stream' in request.headers.get('Accept', '')
 
         # Process message through agent service (RAG → NLU → GraphRAG → Intent routing → Response)
-        result = agent_service.process_message(
+        result = get_agent_service().process_message(
             user_input=user_message,
-            conversation_history=session['conversation_history'],
-            user_id=user['id']
+            conversation_history=get_conversation_history(user['id']),
+            user_id=user['id'],
+            history_summary=get_running_summary(user['id']),
+            recent_entry=get_recent_entry(user['id']),
+            stream=wants_stream
         )
 
         if not result['success']:
             return jsonify({'error': result.get('error', 'Processing failed')}), 500
 
-        ai_response = result['response']
+        if wants_stream:
+            return stream_chat_response(result, user['id'], user_message)
 
-        # Update conversation history
-        session['conversation_history'].append({"role": "user", "content": user_message})
-        session['conversation_history'].append({"role": "assistant", "content": ai_response})
-
-        # Keep only last 20 messages to prevent session from growing too large
-        if len(session['conversation_history']) > 20:
-            session['conversation_history'] = session['conversation_history'][-20:]
-
-        session.modified = True
+        ai_response = result['response']
+        record_exchange(user['id'], user_message, ai_response)
 
         return jsonify({
             'response': ai_response,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': iso_timestamp(),
             'intent': result.get('intent', 'general'),
             'context_used': {
                 'rag': result.get('rag_context_used', False),
@@ -459,10 +666,36 @@ def chat():
 @require_auth
 def new_session():
     """Start a new session"""
-    session['conversation_history'] = []
-    session.modified = True
+    clear_conversation(g.user['id'])
     return jsonify({'status': 'New session started'})
 
+def store_entry_graph(nlu_future, user_id: str, entry_id: str, summary: str):
+    """Store an entry's NLU metadata in Neo4j once its NLU future resolves; submitted to the
+    executor so it runs off the request thread"""
+    try:
+        nlu_result = nlu_future.result()
+        
+        # Store NLU metadata in Neo4j GraphRAG with updated schema
+        graph_result = neo4j_service.insert_entities_and_relationships(
+            user_id=user_id,
+            entry_id=entry_id,
+            entities=nlu_result.get('entities', []),
+            relationships=nlu_result.get('relationships', []),
+            emotions=nlu_result.get('emotions', []),
+            events=nlu_result.get('events', []),
+            summary=summary  # Pass summary for Entry node
+        )
+        
+        if graph_result.get('success'):
+            neo4j_service.invalidate_user_cache(user_id)
+            logger.info(f"GraphRAG storage successful: {graph_result.get('entities_inserted', 0)} entities, "
+                       f"{graph_result.get('emotions_inserted', 0)} emotions, "
+                       f"{graph_result.get('relationships_inserted', 0)} relationships")
+        else:
+            logger.warning(f"GraphRAG storage failed: {graph_result.get('error', 'Unknown error')}")
+    except Exception as nlu_error:
+        logger.error(f"NLU processing failed for entry {entry_id}: {str(nlu_error)}")
+
 @app.route('/save_entry', methods=['POST'])
 @require_auth
 def save_entry():
@@ -471,17 +704,43 @@ def save_entry():
         access_token, refresh_token = get_tokens_from_request()
         user = auth_service.get_current_user(access_token=access_token, refresh_token=refresh_token)
         
-        if 'conversation_history' not in session or not session['conversation_history']:
+        conversation_history = get_conversation_history(user['id'])
+        if not conversation_history:
             return jsonify({'error': 'No conversation to save'}), 400
 
-        # Generate summary
-        summary = summary_service.generate_summary(session['conversation_history'])
+        # NLU Processing: Extract entities, events, emotions, relationships, and intent
+        # Combine all user messages for comprehensive NLU analysis
+        full_conversation_text = "\n".join([
+            turn.get('content', '') 
+            for turn in conversation_history 
+            if turn.get('role') == 'user'
+        ])
+
+        # Summary, chunk embeddings and NLU are independent API calls, so run them side by side
+        chunks = embedding_service.chunk_conversation(conversation_history)
+        summary_future = executor.submit(
+            summary_service.generate_summary, conversation_history, get_running_summary(user['id'])
+        )
+        embedding_future = executor.submit(embedding_service.generate_embeddings, chunks)
+        nlu_future = None
+        if full_conversation_text:
+            logger.info("Running NLU processing alongside summary generation")
+            nlu_future = executor.submit(nlu_service.process_text, full_conversation_text)
+
+        summary = summary_future.result()
+        try:
+            embeddings = embedding_future.result()
+        except Exception as embed_error:
+            logger.warning(f"Failed to generate embeddings: {str(embed_error)}")
+            chunks, embeddings = [], []
         
-        # Save entry to database
-        result = journal_service.save_entry(
+        # Save entry and its embeddings to database in one write
+        result = journal_service.save_entry_with_embeddings(
             user_id=user['id'],
-            conversation_history=session['conversation_history'],
+            conversation_history=conversation_history,
             summary=summary,
+            chunks=chunks,
+            embeddings=embeddings,
             access_token=access_token,
             refresh_token=refresh_token
         )
@@ -490,60 +749,27 @@ def save_entry():
             return jsonify({'error': result['error']}), 500
         
         entry_id = result['entry']['id']
+        if summary:
+            remember_recent_entry(user['id'], summary)
+        # The new entry is now retrievable; don't keep serving context from before it
+        get_agent_service().invalidate_user_cache(user['id'])
         
-        # Generate and store embeddings
-        chunks = embedding_service.chunk_conversation(session['conversation_history'])
-        embedding_result = embedding_service.store_embeddings(entry_id, user['id'], chunks)
-        
-        if not embedding_result['success']:
-            logger.warning(f"Failed to store embeddings: {embedding_result['error']}")
-        
-        # NLU Processing: Extract entities, events, emotions, relationships, and intent
-        # Combine all user messages for comprehensive NLU analysis
-        full_conversation_text = "\n".join([
-            turn.get('content', '') 
-            for turn in session['conversation_history'] 
-            if turn.get('role') == 'user'
-        ])
-        
-        graph_result = {'success': False}
-        if full_conversation_text:
-            logger.info(f"Running NLU processing for entry {entry_id}")
-            try:
-                nlu_result = nlu_service.process_text(full_conversation_text)
-                
-                # Store NLU metadata in Neo4j GraphRAG with updated schema
-                graph_result = neo4j_service.insert_entities_and_relationships(
-                    user_id=user['id'],
-                    entry_id=entry_id,
-                    entities=nlu_result.get('entities', []),
-                    relationships=nlu_result.get('relationships', []),
-                    emotions=nlu_result.get('emotions', []),
-                    events=nlu_result.get('events', []),
-                    summary=summary  # Pass summary for Entry node
-                )
-                
-                if graph_result.get('success'):
-                    logger.info(f"GraphRAG storage successful: {graph_result.get('entities_inserted', 0)} entities, "
-                               f"{graph_result.get('emotions_inserted', 0)} emotions, "
-                               f"{graph_result.get('relationships_inserted', 0)} relationships")
-                else:
-                    logger.warning(f"GraphRAG storage failed: {graph_result.get('error', 'Unknown error')}")
-            except Exception as nlu_error:
-                logger.error(f"NLU processing failed: {str(nlu_error)}")
-                graph_result = {'success': False, 'error': str(nlu_error)}
+        # Graph storage runs on the executor, waiting there for NLU if it is still
+        # going, so the response never waits on NLU or Neo4j. (A done-callback would
+        # run inline here, since NLU has usually finished by now.)
+        if nlu_future is not None:
+            executor.submit(store_entry_graph, nlu_future, user['id'], entry_id, summary)
         
-        # Clear session
-        session['conversation_history'] = []
-        session.modified = True
+        # Clear the finished conversation
+        clear_conversation(user['id'])
         
         return jsonify({
             'success': True,
             'message': 'Entry saved successfully',
             'entry_id': entry_id,
             'nlu_processed': bool(full_conversation_text),
-            'graph_stored': graph_result.get('success', False) if full_conversation_text else False
-        })
+            'graph_queued': nlu_future is not None
+        }), 202
 
     except Exception as e:
         logger.error(f"Save entry error: {str(e)}")
@@ -609,6 +835,7 @@ def api_delete_entry(entry_id):
                                               access_token=access_token, refresh_token=refresh_token)
         
         if result['success']:
+            get_agent_service().invalidate_user_cache(user['id'])
             return jsonify({'success': True, 'message': result['message']})
         else:
             return jsonify({'error': result['error']}), 500
@@ -617,8 +844,14 @@ def api_delete_entry(entry_id):
         logger.error(f"Delete entry error: {str(e)}")
         return jsonify({'error': 'Failed to delete entry'}), 500
 
+@app.route('/api/cache-stats', methods=['GET'])
+@require_auth
+def api_cache_stats():
+    """Hit rates of the reply-path caches, for monitoring"""
+    return jsonify(get_agent_service().cache_stats())
+
 if __name__ == '__main__':
-    if not assistant:
+    if not os.getenv("OPENAI_API_KEY"):
         print("WARNING: OpenAI API key not configured. Please set OPENAI_API_KEY environment variable.")
         print("The web app will start but chat functionality will not work.")
 
@@ -630,7 +863,7 @@ if __name__ == '__main__':
     is_production = os.environ.get('RENDER') is not None
     if is_production:
         # Production: Don't run directly, gunicorn will handle it
-        print("Production mode: Use 'gunicorn app:app' to start")
+        print("Production mode: Use 'gunicorn -k gevent wsgi:app' to start")
     else:
         # Development: Use Flask's development server
         app.run(debug=True, host='0.0.0.0', port=port)
\ No newline at end of file
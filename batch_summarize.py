@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Goldfish Batch Summarizer
+Summarize saved CLI sessions offline through the OpenAI Batch API
+(half the price of live calls, results within 24 hours)
+
+Usage:
+    python batch_summarize.py submit [--wait]   # queue every saved session
+    python batch_summarize.py collect BATCH_ID  # merge finished summaries into sessions/index.json
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+import orjson
+import openai
+from dotenv import load_dotenv
+
+from main import CHAT_MODEL, EPISODE_INDEX_PATH, SESSION_FORMATS, SESSIONS_DIR, read_session_file
+
+# Load environment variables from .env file
+load_dotenv()
+
+BATCH_INPUT_PATH = os.path.join(SESSIONS_DIR, "batch_input.jsonl")
+POLL_INTERVAL_SECONDS = 60
+FINISHED_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize this journaling session in 2-3 sentences, capturing the key themes, "
+    "emotions, and insights. Then add one line starting with 'Mood:' naming the overall mood."
+)
+
+def build_batch_rows() -> list:
+    """One chat completion request per saved session, keyed by file name"""
+    rows = []
+    for filepath in sorted(glob.glob(os.path.join(SESSIONS_DIR, "journal_session_*"))):
+        if not filepath.endswith(tuple(SESSION_FORMATS.values())):
+            continue
+        history = read_session_file(filepath).get("conversation_history", [])
+        transcript = "\n".join(
+            f"{turn['role'].title()}: {turn['content']}"
+            for turn in history
+            if turn.get("role") in ("user", "assistant")
+        )
+        if not transcript:
+            continue
+        rows.append({
+            "custom_id": os.path.basename(filepath),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": CHAT_MODEL,
+                "messages": [
+                    {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                    {"role": "user", "content": transcript}
+                ],
+                "max_tokens": 200
+            }
+        })
+    return rows
+
+def submit(client: openai.OpenAI, wait: bool):
+    """Upload the batch input file and start the batch"""
+    rows = build_batch_rows()
+    if not rows:
+        print("No saved sessions to summarize.")
+        return
+
+    with open(BATCH_INPUT_PATH, 'wb') as f:
+        f.write(b"\n".join(orjson.dumps(row) for row in rows) + b"\n")
+
+    with open(BATCH_INPUT_PATH, 'rb') as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    print(f"Submitted {len(rows)} sessions as batch {batch.id}")
+
+    if wait:
+        collect(client, batch.id, wait=True)
+
+def collect(client: openai.OpenAI, batch_id: str, wait: bool = False):
+    """Download a finished batch and merge its summaries into the session index"""
+    batch = client.batches.retrieve(batch_id)
+    while wait and batch.status not in FINISHED_STATUSES:
+        print(f"Batch {batch_id} is {batch.status}; checking again in {POLL_INTERVAL_SECONDS}s")
+        time.sleep(POLL_INTERVAL_SECONDS)
+        batch = client.batches.retrieve(batch_id)
+
+    if batch.status != "completed" or not batch.output_file_id:
+        print(f"Batch {batch_id} is {batch.status}; nothing to collect yet.")
+        return
+
+    summaries = {}
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        result = orjson.loads(line)
+        response = result.get("response") or {}
+        if response.get("status_code") == 200:
+            summaries[result["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+
+    try:
+        with open(EPISODE_INDEX_PATH, 'rb') as f:
+            index = orjson.loads(f.read())
+    except (OSError, ValueError):
+        index = {"episodes": []}
+    index.setdefault("session_summaries", {}).update(summaries)
+    with open(EPISODE_INDEX_PATH, 'wb') as f:
+        f.write(orjson.dumps(index))
+
+    print(f"Merged {len(summaries)} session summaries into {EPISODE_INDEX_PATH}")
+
+def main():
+    """Batch summarizer entry point"""
+    parser = argparse.ArgumentParser(description="Summarize saved Goldfish sessions with the OpenAI Batch API")
+    commands = parser.add_subparsers(dest="command", required=True)
+    submit_parser = commands.add_parser("submit", help="queue every saved session for summarization")
+    submit_parser.add_argument("--wait", action="store_true", help="poll until the batch finishes, then collect it")
+    collect_parser = commands.add_parser("collect", help="merge a finished batch into the session index")
+    collect_parser.add_argument("batch_id")
+    args = parser.parse_args()
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("OpenAI API key required. Set OPENAI_API_KEY environment variable.")
+        sys.exit(1)
+    client = openai.OpenAI(api_key=api_key)
+
+    if args.command == "submit":
+        submit(client, args.wait)
+    else:
+        collect(client, args.batch_id)
+
+if __name__ == "__main__":
+    main()
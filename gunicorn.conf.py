@@ -0,0 +1,10 @@
+"""
+Gunicorn server hooks for Goldfish
+Worker settings stay on the command line in the Procfile and render.yaml
+"""
+
+def post_worker_init(worker):
+    """Warm the worker's API connections once the app is loaded, before it takes requests"""
+    from app import warmup, WARMUP_ON_START
+    if WARMUP_ON_START:
+        warmup()
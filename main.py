@@ -5,24 +5,145 @@ Minimal implementation of a gentle, guided journaling chatbot
 """
 
 import openai
-import json
+import asyncio
+import orjson
+import numpy as np
+import uuid
 import os
+import sys
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
+from services.tokens import cap_message_tokens, count_message_tokens, MAX_HISTORY_MESSAGE_TOKENS
+
+# prompt_toolkit lets the next message be typed while a reply is still streaming;
+# without it the CLI falls back to a plain input() loop
+try:
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.patch_stdout import patch_stdout
+    PROMPT_TOOLKIT_AVAILABLE = True
+except ImportError:
+    PROMPT_TOOLKIT_AVAILABLE = False
 
 # Load environment variables from .env file
 load_dotenv()
 
+CHAT_MODEL = "gpt-4o-mini"
+API_MAX_RETRIES = 5
+API_TIMEOUT_SECONDS = 30
+EMBEDDING_MODEL = "text-embedding-3-small"
+SESSIONS_DIR = "sessions"
+EPISODE_INDEX_PATH = os.path.join(SESSIONS_DIR, "index.json")
+MAX_EPISODES_PER_SESSION = 5
+# Below this cosine similarity a past episode isn't worth spending prompt tokens on
+EPISODE_MIN_SIMILARITY = 0.35
+
+# Reply length: never more than MAX_REPLY_TOKENS, and never past the context window
+MAX_REPLY_TOKENS = 500
+CONTEXT_LIMIT_TOKENS = 16000
+CONTEXT_MARGIN_TOKENS = 64
+
+# Session file formats and their extensions
+SESSION_FORMATS = {"jsonl": ".jsonl", "json": ".json"}
+
+# Semantic response cache: near-identical (recent context + message) reuses a past reply
+RESPONSE_CACHE_PATH = os.path.join(SESSIONS_DIR, "response_cache.npz")
+RESPONSE_CACHE_MIN_SIMILARITY = 0.92
+RESPONSE_CACHE_MAX_ENTRIES = 1000
+
+# Offline mode: send every request to a local OpenAI-compatible server instead, e.g.
+# `ollama serve` (http://localhost:11434/v1) or llama.cpp's llama-server running a
+# 4-bit quantized model. Local embeddings have their own dimensions, so the episode
+# index and response cache are kept in separate files.
+LOCAL_BASE_URL = os.getenv("GOLDFISH_LOCAL_BASE_URL")
+LOCAL_CHAT_MODEL = os.getenv("GOLDFISH_LOCAL_MODEL", "llama3.2:3b")
+LOCAL_EMBEDDING_MODEL = os.getenv("GOLDFISH_LOCAL_EMBEDDING_MODEL", "nomic-embed-text")
+LOCAL_EPISODE_INDEX_PATH = os.path.join(SESSIONS_DIR, "index_local.json")
+LOCAL_RESPONSE_CACHE_PATH = os.path.join(SESSIONS_DIR, "response_cache_local.npz")
+
+def _spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster unit vectors by cosine similarity; returns (centroids, labels)"""
+    rng = np.random.default_rng(0)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(vectors @ centroids.T, axis=1)
+        for j in range(k):
+            members = vectors[labels == j]
+            if len(members):
+                centroid = members.mean(axis=0)
+                centroids[j] = centroid / np.linalg.norm(centroid)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+def read_session_file(filepath: str) -> Dict:
+    """Read a saved session (.jsonl or .json) into a dict with
+    "conversation_history" and "session_data" keys"""
+    if filepath.endswith(SESSION_FORMATS["jsonl"]):
+        session_data = {"conversation_history": [], "session_data": {}}
+        with open(filepath, 'rb') as f:
+            for line in f:
+                record = orjson.loads(line)
+                if "role" in record:
+                    session_data["conversation_history"].append(record)
+                elif "session_data" in record:
+                    session_data["session_data"] = record["session_data"]
+        return session_data
+
+    with open(filepath, 'rb') as f:
+        return orjson.loads(f.read())
+
 class JournalingAssistant:
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        if not self.api_key:
+        if LOCAL_BASE_URL:
+            # Local servers ignore the key, but the SDK requires one
+            self.api_key = self.api_key or "local"
+            self.chat_model = LOCAL_CHAT_MODEL
+            self.embedding_model = LOCAL_EMBEDDING_MODEL
+            self.episode_index_path = LOCAL_EPISODE_INDEX_PATH
+            self.response_cache_path = LOCAL_RESPONSE_CACHE_PATH
+        elif not self.api_key:
             raise ValueError("OpenAI API key required. Set OPENAI_API_KEY environment variable.")
-
-        openai.api_key = self.api_key
-        self.conversation_history = []
-        self.session_data = {}
+        else:
+            self.chat_model = CHAT_MODEL
+            self.embedding_model = EMBEDDING_MODEL
+            self.episode_index_path = EPISODE_INDEX_PATH
+            self.response_cache_path = RESPONSE_CACHE_PATH
+
+        # One client for the whole session so the HTTPS connection is reused
+        # The SDK retries rate limits, 5xx and connection errors with jittered
+        # exponential backoff (honouring Retry-After) before we ever see an error
+        self.client = openai.OpenAI(
+            api_key=self.api_key, base_url=LOCAL_BASE_URL, max_retries=API_MAX_RETRIES, timeout=API_TIMEOUT_SECONDS
+        )
+        self._async_client = None
+
+        # Saves, the episode index and the response cache all live here; create it once
+        os.makedirs(SESSIONS_DIR, exist_ok=True)
+
+        # The full transcript: snapshot saves, the running summary's summary_upto index
+        # and episode indexing all need every message, so this stays a plain list.
+        # Only _select_context's bounded gist + recent window is sent to the model.
+        self.conversation_history: List[Dict] = []
+        self.session_data = {"session_id": uuid.uuid4().hex}
+
+        # Append-only session log: messages not yet written, and the file they go to
+        self._unsaved: List[Dict] = []
+        self._session_path: Optional[str] = None
+        self._saved_session_data: Dict = {}
+
+        # Context window: the opening "gist" messages plus the most recent turns
+        self.gist_k = 2
+        self.recent_n = 8
+
+        # Episodes from past sessions: unit-length centroids and their summaries
+        self.episode_summaries: List[str] = []
+        self.episode_centroids = np.empty((0, 0))
+        self._load_episode_index()
+
+        # Semantic response cache: unit-length context embeddings and the replies given
+        self.cache_embeddings = np.empty((0, 0))
+        self.cache_responses: List[str] = []
+        self._load_response_cache()
 
         self.system_prompt = """You are **Rosebud**, a gentle, curious, human-feeling journaling companion and conversational guide. Your purpose is to help users reflect safely, explore what matters, notice patterns, and open small doors of insight — always with warmth and respect, never pressure.
 
@@ -65,63 +186,402 @@ class JournalingAssistant:
   *You:* "I'm here — whenever you're ready. Sometimes it helps to name one small moment from today, whether hard or minor comfort — want to try that?"
 - *Closing:* "Thank you for sharing. Before we stop, is there one word, image, or intention you'd like to carry forward into tomorrow?"""
 
+        # Built once and reused as the first message of every request
+        self._system_msg = {"role": "system", "content": self.system_prompt}
+
+    def _select_context(self) -> List[Dict]:
+        """Pick history to send: the first gist_k messages (the user's opening themes)
+        followed by the last recent_n, dropping the middle of long sessions"""
+        history = self.conversation_history
+        if len(history) <= self.gist_k + self.recent_n:
+            return history
+        return history[:self.gist_k] + history[-self.recent_n:]
+
+    def _refresh_summary(self):
+        """Fold any turns that have scrolled out of the context window into the session summary"""
+        evicted_end = len(self.conversation_history) - self.recent_n
+        start = max(self.gist_k, self.session_data.get("summary_upto", 0))
+        if evicted_end - start < 2:
+            return
+        self._summarize_evicted(self.conversation_history[start:evicted_end])
+        self.session_data["summary_upto"] = evicted_end
+
+    def _summarize_evicted(self, evicted_msgs: List[Dict]):
+        """Compress evicted turns into the running summary kept in session_data["summary"]"""
+        transcript = "\n".join(f"{msg['role'].title()}: {msg['content']}" for msg in evicted_msgs)
+        previous = self.session_data.get("summary", "")
+        try:
+            response = self.client.chat.completions.create(
+                model=self.chat_model,
+                messages=[
+                    {"role": "system", "content": "Compress into ≤100 tokens of salient facts/feelings."},
+                    {"role": "user", "content": f"Summary so far: {previous or '(none)'}\n\nNew turns:\n{transcript}"}
+                ],
+                max_tokens=150,
+                temperature=0.3
+            )
+            self.session_data["summary"] = response.choices[0].message.content.strip()
+        except Exception as e:
+            # Keep the previous summary; the evicted turns are still in the saved history
+            print(f"Could not update session summary: {e}")
+
+    def _build_messages(self, episode: Optional[str] = None) -> List[Dict]:
+        """System prompt and selected history, with the prior-session summary and recalled
+        episode placed just before the latest user message.
+
+        The system prompt is never interpolated and always comes first, so together with
+        the gist turns it forms a byte-identical prefix that OpenAI's prompt cache can reuse;
+        the per-turn context only changes the tail. Earlier turns are capped by tokens, so
+        a few long passages can't blow up every request.
+        """
+        context = self._select_context()
+        messages = [self._system_msg]
+        messages.extend(cap_message_tokens(context[:-1], MAX_HISTORY_MESSAGE_TOKENS))
+        summary = self.session_data.get("summary")
+        if summary:
+            messages.append({"role": "system", "content": "Prior session summary: " + summary})
+        if episode:
+            messages.append({"role": "system", "content": "From an earlier journaling session: " + episode})
+        messages.extend(context[-1:])
+        return messages
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in one request; rows are normalized to unit length"""
+        response = self.client.embeddings.create(model=self.embedding_model, input=texts)
+        vectors = np.array([item.embedding for item in sorted(response.data, key=lambda item: item.index)])
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def _load_episode_index(self):
+        """Load episode centroids saved by earlier sessions"""
+        try:
+            with open(self.episode_index_path, 'rb') as f:
+                episodes = orjson.loads(f.read()).get("episodes", [])
+        except (OSError, ValueError):
+            return
+        if episodes:
+            self.episode_summaries = [episode["summary"] for episode in episodes]
+            self.episode_centroids = np.array([episode["centroid"] for episode in episodes])
+
+    def _embed_turn(self, user_input: str) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Embed (last two turns + message) for the response cache and the message alone
+        for episode recall, in one request; (None, None) if embedding fails"""
+        context_text = "\n".join(m["content"] for m in self.conversation_history[-3:-1])
+        try:
+            vectors = self._embed([f"{context_text}\n{user_input}", user_input])
+        except Exception:
+            return None, None
+        return vectors[0], vectors[1]
+
+    def _recall_episode(self, query: Optional[np.ndarray]) -> Optional[str]:
+        """Return the summary of the past episode closest to the user's message, if any is close enough"""
+        if query is None or not self.episode_summaries:
+            return None
+        scores = self.episode_centroids @ query
+        best = int(np.argmax(scores))
+        return self.episode_summaries[best] if scores[best] >= EPISODE_MIN_SIMILARITY else None
+
+    def _index_episodes(self):
+        """Cluster this session's user messages into episodes and add them to the episode index,
+        replacing episodes from earlier saves of the same session"""
+        texts = [m["content"] for m in self.conversation_history if m["role"] == "user"]
+        if not texts:
+            return
+
+        vectors = self._embed(texts)
+        centroids, labels = _spherical_kmeans(vectors, min(MAX_EPISODES_PER_SESSION, len(texts)))
+
+        new_episodes = []
+        for j, centroid in enumerate(centroids):
+            members = [text for text, label in zip(texts, labels) if label == j]
+            if not members:
+                continue
+            response = self.client.chat.completions.create(
+                model=self.chat_model,
+                messages=[
+                    {"role": "system", "content": "Summarize these journal notes in one or two sentences, keeping names, feelings and topics."},
+                    {"role": "user", "content": "\n".join(members)}
+                ],
+                max_tokens=80,
+                temperature=0.3
+            )
+            new_episodes.append({
+                "session": self.session_data["session_id"],
+                "summary": response.choices[0].message.content.strip(),
+                "centroid": centroid.tolist()
+            })
+
+        try:
+            with open(self.episode_index_path, 'rb') as f:
+                index = orjson.loads(f.read())
+        except (OSError, ValueError):
+            index = {"episodes": []}
+        index["episodes"] = [
+            episode for episode in index["episodes"]
+            if episode.get("session") != self.session_data["session_id"]
+        ] + new_episodes
+        with open(self.episode_index_path, 'wb') as f:
+            f.write(orjson.dumps(index))
+
+        self.episode_summaries = [episode["summary"] for episode in index["episodes"]]
+        self.episode_centroids = np.array([episode["centroid"] for episode in index["episodes"]])
+
+    def _load_response_cache(self):
+        """Load replies cached by earlier sessions"""
+        try:
+            data = np.load(self.response_cache_path)
+        except (OSError, ValueError):
+            return
+        self.cache_embeddings = data["embeddings"]
+        self.cache_responses = data["responses"].tolist()
+
+    def _lookup_response_cache(self, context_vec: Optional[np.ndarray]) -> Optional[str]:
+        """Return a cached reply whose context is nearly identical, if there is one"""
+        if context_vec is None or not self.cache_responses:
+            return None
+        scores = self.cache_embeddings @ context_vec
+        best = int(np.argmax(scores))
+        return self.cache_responses[best] if scores[best] >= RESPONSE_CACHE_MIN_SIMILARITY else None
+
+    def _add_to_response_cache(self, context_vec: Optional[np.ndarray], response: str):
+        """Remember a reply for its context, evicting the oldest entries past the size cap"""
+        if context_vec is None or not response:
+            return
+        if self.cache_responses:
+            self.cache_embeddings = np.vstack([self.cache_embeddings, context_vec])[-RESPONSE_CACHE_MAX_ENTRIES:]
+        else:
+            self.cache_embeddings = context_vec[np.newaxis, :]
+        self.cache_responses = (self.cache_responses + [response])[-RESPONSE_CACHE_MAX_ENTRIES:]
+
+    def _save_response_cache(self):
+        """Persist the response cache next to saved sessions"""
+        if self.cache_responses:
+            np.savez(self.response_cache_path, embeddings=self.cache_embeddings, responses=np.array(self.cache_responses))
+
+    def _reply_budget(self, messages: List[Dict]) -> int:
+        """Cap max_tokens to what's left of the context window after the prompt"""
+        remaining = CONTEXT_LIMIT_TOKENS - count_message_tokens(messages) - CONTEXT_MARGIN_TOKENS
+        return max(1, min(MAX_REPLY_TOKENS, remaining))
+
     def get_response(self, user_input: str) -> str:
         """Get AI response using OpenAI's API"""
+        return "".join(self.stream_response(user_input)).strip()
+
+    def stream_response(self, user_input: str) -> Iterator[str]:
+        """Yield the AI response piece by piece as the model generates it"""
         try:
             # Add user message to conversation history
-            self.conversation_history.append({"role": "user", "content": user_input})
+            self._record({"role": "user", "content": user_input})
+
+            # Reuse the reply from a near-identical earlier exchange
+            context_vec, query_vec = self._embed_turn(user_input)
+            cached = self._lookup_response_cache(context_vec)
+            if cached is not None:
+                self._record({"role": "assistant", "content": cached})
+                yield cached
+                return
 
             # Prepare messages for API call
-            messages = [{"role": "system", "content": self.system_prompt}]
-            messages.extend(self.conversation_history[-10:])  # Keep last 10 exchanges
+            self._refresh_summary()
+            messages = self._build_messages(self._recall_episode(query_vec))
 
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
+            stream = self.client.chat.completions.create(
+                model=self.chat_model,
                 messages=messages,
-                max_tokens=500,
+                max_tokens=self._reply_budget(messages),
                 temperature=0.7,
                 frequency_penalty=0.1,
-                presence_penalty=0.1
+                presence_penalty=0.1,
+                stream=True,
+                # Keep this session's requests on the same warm prefix cache
+                extra_body={"prompt_cache_key": self.session_data["session_id"]}
             )
 
-            assistant_response = response.choices[0].message.content.strip()
+            parts = []
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
 
             # Add assistant response to conversation history
-            self.conversation_history.append({"role": "assistant", "content": assistant_response})
+            assistant_response = "".join(parts).strip()
+            self._record({"role": "assistant", "content": assistant_response})
+            self._add_to_response_cache(context_vec, assistant_response)
+
+        except Exception as e:
+            yield f"I'm having trouble connecting right now. Let me try again in a moment. ({str(e)})"
+
+    @property
+    def async_client(self) -> openai.AsyncOpenAI:
+        """Async client, created on first use so the sync CLI never pays for it"""
+        if self._async_client is None:
+            self._async_client = openai.AsyncOpenAI(
+                api_key=self.api_key, base_url=LOCAL_BASE_URL, max_retries=API_MAX_RETRIES, timeout=API_TIMEOUT_SECONDS
+            )
+        return self._async_client
+
+    async def get_response_async(self, user_input: str) -> str:
+        """Get AI response without blocking the event loop, for callers running many requests concurrently"""
+        try:
+            self._record({"role": "user", "content": user_input})
+
+            context_vec, query_vec = await asyncio.to_thread(self._embed_turn, user_input)
+            cached = self._lookup_response_cache(context_vec)
+            if cached is not None:
+                self._record({"role": "assistant", "content": cached})
+                return cached
+
+            await asyncio.to_thread(self._refresh_summary)
+            messages = self._build_messages(self._recall_episode(query_vec))
+
+            response = await self.async_client.chat.completions.create(
+                model=self.chat_model,
+                messages=messages,
+                max_tokens=self._reply_budget(messages),
+                temperature=0.7,
+                frequency_penalty=0.1,
+                presence_penalty=0.1,
+                extra_body={"prompt_cache_key": self.session_data["session_id"]}
+            )
+
+            assistant_response = response.choices[0].message.content.strip()
+            self._record({"role": "assistant", "content": assistant_response})
+            self._add_to_response_cache(context_vec, assistant_response)
 
             return assistant_response
 
         except Exception as e:
             return f"I'm having trouble connecting right now. Let me try again in a moment. ({str(e)})"
 
-    def save_session(self, filename: Optional[str] = None):
-        """Save current session to file"""
-        if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"journal_session_{timestamp}.json"
+    async def stream_response_async(self, user_input: str) -> AsyncIterator[str]:
+        """Yield the AI response piece by piece without blocking the event loop.
 
-        session_data = {
-            "timestamp": datetime.now().isoformat(),
-            "conversation_history": self.conversation_history,
-            "session_data": self.session_data
-        }
+        If the consuming task is cancelled mid-reply, the part already shown is
+        kept in the history so the conversation still reads user/assistant.
+        """
+        parts = []
+        try:
+            self._record({"role": "user", "content": user_input})
 
-        os.makedirs("sessions", exist_ok=True)
-        filepath = os.path.join("sessions", filename)
+            context_vec, query_vec = await asyncio.to_thread(self._embed_turn, user_input)
+            cached = self._lookup_response_cache(context_vec)
+            if cached is not None:
+                self._record({"role": "assistant", "content": cached})
+                yield cached
+                return
 
-        with open(filepath, 'w') as f:
-            json.dump(session_data, f, indent=2)
+            await asyncio.to_thread(self._refresh_summary)
+            messages = self._build_messages(self._recall_episode(query_vec))
+
+            stream = await self.async_client.chat.completions.create(
+                model=self.chat_model,
+                messages=messages,
+                max_tokens=self._reply_budget(messages),
+                temperature=0.7,
+                frequency_penalty=0.1,
+                presence_penalty=0.1,
+                stream=True,
+                extra_body={"prompt_cache_key": self.session_data["session_id"]}
+            )
+
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            finally:
+                # Release the connection even when the reply is cut short
+                await stream.close()
+
+            assistant_response = "".join(parts).strip()
+            self._record({"role": "assistant", "content": assistant_response})
+            self._add_to_response_cache(context_vec, assistant_response)
+
+        except asyncio.CancelledError:
+            if parts:
+                self._record({"role": "assistant", "content": "".join(parts).strip()})
+            raise
+        except Exception as e:
+            yield f"I'm having trouble connecting right now. Let me try again in a moment. ({str(e)})"
+
+    def _record(self, message: Dict):
+        """Add a message to the conversation and to the buffer of messages not yet saved"""
+        self.conversation_history.append(message)
+        self._unsaved.append(message)
+
+    def flush_session(self) -> str:
+        """Append messages recorded since the last flush to this session's JSONL log"""
+        if self._session_path is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self._session_path = os.path.join(SESSIONS_DIR, f"journal_session_{timestamp}{SESSION_FORMATS['jsonl']}")
+            self._unsaved.insert(0, {"timestamp": datetime.now().isoformat()})
+
+        lines = [orjson.dumps(message) for message in self._unsaved]
+        if self.session_data != self._saved_session_data:
+            lines.append(orjson.dumps({"session_data": self.session_data}))
+
+        if lines:
+            with open(self._session_path, 'ab') as f:
+                f.write(b"\n".join(lines) + b"\n")
+            self._unsaved.clear()
+            self._saved_session_data = dict(self.session_data)
+
+        return self._session_path
+
+    def save_session(self, filename: Optional[str] = None, fmt: str = "jsonl"):
+        """Save current session to file: appended to a JSONL log by default, or as a JSON snapshot"""
+        if fmt not in SESSION_FORMATS:
+            raise ValueError(f"Unknown session format: {fmt}")
+
+        if fmt == "jsonl":
+            if filename and os.path.join(SESSIONS_DIR, filename) != self._session_path:
+                # A new log file has to start with the whole conversation
+                self._session_path = os.path.join(SESSIONS_DIR, filename)
+                self._unsaved = list(self.conversation_history)
+                self._saved_session_data = {}
+            filepath = self.flush_session()
+        else:
+            if not filename:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                filename = f"journal_session_{timestamp}{SESSION_FORMATS[fmt]}"
+
+            session_data = {
+                "timestamp": datetime.now().isoformat(),
+                "conversation_history": self.conversation_history,
+                "session_data": self.session_data
+            }
+
+            filepath = os.path.join(SESSIONS_DIR, filename)
+
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(session_data))
+
+        # Make this session's topics recallable from future sessions
+        try:
+            self._index_episodes()
+        except Exception as e:
+            print(f"Could not index session for recall: {e}")
+        self._save_response_cache()
 
         return filepath
 
     def load_session(self, filepath: str):
-        """Load previous session from file"""
+        """Load previous session from a .jsonl or .json file"""
         try:
-            with open(filepath, 'r') as f:
-                session_data = json.load(f)
+            session_data = read_session_file(filepath)
+            # Further saves of a JSONL log keep appending to the same file
+            self._session_path = filepath if filepath.endswith(SESSION_FORMATS["jsonl"]) else None
 
             self.conversation_history = session_data.get("conversation_history", [])
             self.session_data = session_data.get("session_data", {})
+            self.session_data.setdefault("session_id", uuid.uuid4().hex)
+            self._unsaved = []
+            self._saved_session_data = dict(self.session_data) if self._session_path else {}
 
             return True
         except Exception as e:
@@ -146,8 +606,8 @@ class ChatInterface:
             print(f"Unexpected error: {e}")
             return False
 
-    def start_session(self):
-        """Start a new journaling session"""
+    def print_welcome(self):
+        """Print the session banner"""
         print("\n" + "="*50)
         print("🌸 Welcome to Goldfish Journaling Assistant 🌸")
         print("="*50)
@@ -155,9 +615,12 @@ class ChatInterface:
         print("Type 'quit' to end session, 'save' to save current session")
         print("="*50 + "\n")
 
+    def start_session(self):
+        """Start a new journaling session"""
+        self.print_welcome()
+
         # Initial greeting
-        initial_response = self.assistant.get_response("Hello")
-        print(f"Goldfish: {initial_response}\n")
+        self.print_response("Hello", prefix="Goldfish: ")
 
         while True:
             try:
@@ -173,8 +636,13 @@ class ChatInterface:
                 elif not user_input:
                     continue
 
-                response = self.assistant.get_response(user_input)
-                print(f"\nGoldfish: {response}\n")
+                self.print_response(user_input, prefix="\nGoldfish: ")
+
+                # Appending the new turn to the session log is cheap, so do it every turn
+                try:
+                    self.assistant.flush_session()
+                except OSError as e:
+                    print(f"Could not write session log: {e}")
 
             except KeyboardInterrupt:
                 print("\n\nSession interrupted. Saving your conversation...")
@@ -184,6 +652,83 @@ class ChatInterface:
                 print(f"Error: {e}")
                 continue
 
+    async def start_session_async(self):
+        """Start a new journaling session where the next message can be typed while
+        the previous reply is still streaming in above the prompt.
+
+        Sending a message, or pressing Ctrl-C, while a reply is streaming cuts it short.
+        """
+        self.print_welcome()
+        session = PromptSession()
+
+        with patch_stdout():
+            # Initial greeting
+            reply = asyncio.create_task(self.print_response_async("Hello", prefix="Goldfish: "))
+
+            while True:
+                try:
+                    user_input = (await session.prompt_async("You: ")).strip()
+                except KeyboardInterrupt:
+                    if not reply.done():
+                        reply.cancel()
+                        continue
+                    print("\n\nSession interrupted. Saving your conversation...")
+                    self.end_session()
+                    break
+                except EOFError:
+                    user_input = "quit"
+
+                if not user_input:
+                    continue
+
+                # Barge-in: stop the reply still streaming before handling the new input
+                if not reply.done():
+                    reply.cancel()
+                    try:
+                        await reply
+                    except asyncio.CancelledError:
+                        pass
+
+                if user_input.lower() in ['quit', 'exit', 'bye']:
+                    self.end_session()
+                    break
+                elif user_input.lower() == 'save':
+                    filepath = self.assistant.save_session()
+                    print(f"Session saved to: {filepath}")
+                    continue
+
+                reply = asyncio.create_task(self.print_response_async(user_input, prefix="\nGoldfish: "))
+
+    def print_response(self, user_input: str, prefix: str):
+        """Print the assistant's reply as it streams in"""
+        write, flush = sys.stdout.write, sys.stdout.flush
+        write(prefix)
+        for piece in self.assistant.stream_response(user_input):
+            write(piece)
+            # Flushed per piece: line buffering would hold the reply back until a newline
+            flush()
+        write("\n\n")
+        flush()
+
+    async def print_response_async(self, user_input: str, prefix: str):
+        """Print the assistant's reply as it streams in, then append the turn to the session log.
+
+        Under patch_stdout, text is drawn above the prompt a line at a time, so
+        pieces are not flushed individually.
+        """
+        write = sys.stdout.write
+        write(prefix)
+        try:
+            async for piece in self.assistant.stream_response_async(user_input):
+                write(piece)
+        finally:
+            write("\n\n")
+
+        try:
+            self.assistant.flush_session()
+        except OSError as e:
+            print(f"Could not write session log: {e}")
+
     def end_session(self):
         """End the current session"""
         print("\nThank you for taking time to reflect today.")
@@ -203,7 +748,10 @@ def main():
     if not interface.setup_assistant():
         return
 
-    interface.start_session()
+    if PROMPT_TOOLKIT_AVAILABLE and sys.stdin.isatty():
+        asyncio.run(interface.start_session_async())
+    else:
+        interface.start_session()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -4,25 +4,25 @@ Goldfish Web App Launcher
 Simple script to start the web application
 """
 
+import importlib.util
 import os
 import sys
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+def load_environment():
+    """Load environment variables from .env file (dotenv is only imported here)"""
+    from dotenv import load_dotenv
+    load_dotenv()
 
 def check_requirements():
-    """Check if required dependencies are installed"""
-    try:
-        import flask
-        import openai
-        print("✓ Dependencies found")
-        return True
-    except ImportError as e:
-        print(f"✗ Missing dependency: {e}")
-        print("\nPlease install requirements:")
-        print("pip install -r requirements.txt")
-        return False
+    """Check if required dependencies are installed, without importing them"""
+    for module in ("flask", "openai", "dotenv"):
+        if importlib.util.find_spec(module) is None:
+            print(f"✗ Missing dependency: {module}")
+            print("\nPlease install requirements:")
+            print("pip install -r requirements.txt")
+            return False
+    print("✓ Dependencies found")
+    return True
 
 def check_api_key():
     """Check if OpenAI API key is configured"""
@@ -47,6 +47,8 @@ def main():
     if not check_requirements():
         sys.exit(1)
 
+    load_environment()
+
     # Check API key
     if not check_api_key():
         print("\n⚠️  Warning: The app will start but chat won't work without an API key")
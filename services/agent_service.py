@@ -2,35 +2,131 @@
 Agent Service - Orchestrates the complete journaling pipeline
 RAG → NLU → GraphRAG → Intent Routing → Response Generation
 """
-from typing import List, Dict, Any, Optional
-import openai
+from typing import List, Dict, Any, Optional, Iterator, Union, Tuple, Callable
 import os
+import re
+import random
+import uuid
+import hashlib
 import logging
+import threading
+import time
+import orjson
+from functools import lru_cache
+from types import MappingProxyType
+from cachetools import TTLCache
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
 
 # Import services
+from services.openai_client import get_openai_client
 from services.rag_service import rag_service
 from services.nlu_service import nlu_service
 from services.neo4j_service import neo4j_service
+from services.embedding_service import embedding_service
+from services.semantic_cache import SemanticCache
+from services.singleflight import SingleFlight
+from services.timing import PhaseTimer, timed
+from services.tokens import (
+    cap_message_tokens, pack_to_token_budget, trim_to_token_budget, trim_lines_to_token_budget,
+    MAX_HISTORY_TOKENS, MAX_HISTORY_MESSAGE_TOKENS, MAX_CONTEXT_TOKENS, MAX_GRAPH_CONTEXT_TOKENS
+)
 
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-class AgentService:
-    """Main orchestration service for journaling assistant"""
-    
-    def __init__(self):
-        self.api_key = os.getenv("OPENAI_API_KEY")
-        
-        if not self.api_key:
-            raise ValueError("OPENAI_API_KEY must be set in environment variables")
-        
-        openai.api_key = self.api_key
-        
-        # System prompt for Goldfish - Conversational Interviewer Guide
-        self.system_prompt = """You are **Goldfish**, a warm, conversational interviewer who helps people explore their thoughts and feelings through gentle dialogue.
+# Chat model for every agent reply; gpt-4o-mini caches repeated prompt prefixes
+# automatically, so the static system message is billed and processed once per cache window
+CHAT_MODEL = "gpt-4o-mini"
+
+# Reply generation parameters, tuned for concise output; shared by live and batch replies
+RESPONSE_PARAMS = {
+    "model": CHAT_MODEL,
+    "max_tokens": 100,  # Reduced for concise responses; the prompt asks for under 50 words
+    "temperature": 0.7,
+    "frequency_penalty": 0.2,  # Slightly higher to encourage variety
+    "presence_penalty": 0.1,
+    # Stop if the model starts writing the next dialogue turn itself
+    "stop": ["\n\nUser:", "\n\nYou:"]
+}
+
+# Closing reflections get a little more room so they aren't cut off mid-sentence
+CLOSING_REPLY_TOKENS = 160
+CLOSING_KEYWORDS = ("wrap up", "wrapping up", "that's all", "thats all", "goodbye", "good night", "bye", "end the session", "closing")
+
+# How long a reply waits on the knowledge graph before answering without it
+GRAPH_TIMEOUT_SECONDS = 1.0
+
+# How long after it starts a reply waits on past-entry retrieval before answering without it
+RAG_TIMEOUT_SECONDS = 0.8
+
+# Intent-specific guidance added to the per-turn prompt; read-only since every
+# AgentService shares it
+INTENT_PROMPTS = MappingProxyType({
+    "self-reflection": "Engage conversationally to help them reflect on patterns in their thinking. Use warm, simple language, and if they show clear insight, acknowledge it warmly.",
+    "planning": "Gently explore their plans through conversation. What feelings or worries might be influencing this decision?",
+    "emotional-release": "This entry has strong feelings. With warmth, help them understand what's behind these emotions using simple, gentle questions.",
+    "insight-generation": "Notice patterns in what they're sharing. Use conversational language, and if they show awareness, celebrate that insight.",
+    "general": "Engage warmly and simply to understand what they're feeling and thinking. Use easy conversational questions, and acknowledge when they show progress."
+})
+
+# Workflow identifiers per intent
+INTENT_WORKFLOWS = MappingProxyType({
+    "self-reflection": "reflective_response",
+    "planning": "planning_tracking",
+    "emotional-release": "emotional_grounding",
+    "insight-generation": "insight_generation",
+    "general": "reflective_response"
+})
+
+# Contextual greetings are reused while the user's recent context is unchanged;
+# the TTL lets the wording vary from day to day
+GREETING_CACHE_SIZE = 4096
+GREETING_CACHE_TTL_SECONDS = 6 * 60 * 60
+
+# Welcomes that name the topic of the user's recent entry; filled in without an LLM call
+GREETING_TEMPLATES = (
+    "Welcome back. How have things been with {topic}?",
+    "Welcome back. Any updates on {topic}?",
+    "Welcome back. How are you feeling about {topic} now?"
+)
+
+# "... worried about my sister's wedding." -> "my sister's wedding": a short phrase
+# after "about" that ends the clause
+GREETING_TOPIC_RE = re.compile(
+    r"\babout ([a-z][\w'-]*(?: [a-z][\w'-]*){0,3}?)(?=[.,;:!?\n]| (?:and|but|because|since|so|that|which|when|while)\b)",
+    re.IGNORECASE
+)
+# Possessives and articles that start a topic are rephrased for the user ("my job" -> "your job")
+GREETING_TOPIC_DETERMINERS = {"my": "your", "our": "your", "their": "your", "his": "your", "her": "your", "a": "the", "an": "the"}
+# Topics containing these don't read well in a template ("about how I felt", "about tomorrow")
+GREETING_TOPIC_REJECT_WORDS = {
+    "i", "me", "myself", "we", "us", "they", "them", "he", "him", "she", "her", "his", "it", "my", "our", "their",
+    "how", "what", "why", "whether", "who", "when", "where",
+    "today", "tonight", "tomorrow", "yesterday"
+}
+
+# Replies to reworded repeats of a recent message ("I'm so anxious today" /
+# "feeling really anxious today") are reused instead of rerunning the pipeline
+RESPONSE_CACHE_TTL_SECONDS = 10 * 60
+
+# Cached replies are only reused at the same point in a conversation: the cache is
+# partitioned by a digest of the running summary and this many latest history
+# messages, so "ok" later in a session doesn't get the reply written for an earlier "ok"
+RESPONSE_CACHE_HISTORY_MESSAGES = 4
+
+# Short messages containing one of these words are treated as greetings; anything
+# longer than a few words' worth of characters is ruled out before splitting
+GREETING_MAX_CHARS = 40
+GREETING_RE = re.compile(
+    r"\b(?:hello|hi|hey|greetings|good (?:morning|afternoon|evening)|sup|what'?s up)\b",
+    re.IGNORECASE
+)
+
+# System prompt for Goldfish - Conversational Interviewer Guide
+SYSTEM_PROMPT = """You are **Goldfish**, a warm, conversational interviewer who helps people explore their thoughts and feelings through gentle dialogue.
 
 **Core Purpose**
 - Engage in natural conversation to help users understand themselves better
@@ -128,6 +224,76 @@ Response: "Understandable. Missing someone is complex. What exactly are you miss
 - Simple language only—avoid psychological complexity
 - Gentle questions that make them think, without stressing them out"""
 
+# Strict format reminder, kept after the guide in the same static message
+FORMAT_PROMPT = "**CRITICAL: Response Format (MUST FOLLOW)**\n- ALWAYS start with a conversational filler: \"I see...\" / \"Makes sense...\" / \"Understandable...\" / \"I hear you...\"\n- Brief observation about their situation (1-2 clauses) using simple, everyday language\n- ONE gentle, conversational question OR acknowledge their progress if they show insight\n- Keep it warm and conversational—like talking to a caring friend\n- Use simple language—avoid complex psychological terms\n- Total response under 50 words\n- Make it feel natural and empathetic"
+
+# First message of every reply request. It never changes between turns or users, so
+# the whole block (~1.4k tokens) stays a byte-identical, cacheable prompt prefix
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT + "\n\n" + FORMAT_PROMPT}
+
+# System message for LLM-written welcomes; built once and shared, so never mutate it
+GREETING_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are Goldfish, an empathetic journaling guide. Generate a brief, warm welcome message (under 20 words) that optionally references the user's recent journal entries. Be professional yet caring. Examples: 'Welcome back. How have you been?' or 'Welcome back. How are you feeling today?'"
+}
+
+# Sections of the per-turn guidance message, filled in by _build_messages
+CONTEXT_SECTION_TEMPLATE = (
+    "**Context from Past Entries:**\n{context}\n\n"
+    "Use this context subtly and naturally, but don't over-reference it. Reference it like `I remember you mentioned X some time ago — how is that going lately?`"
+)
+GUIDANCE_TEMPLATE = "**Current Task:** {intent_prompt}\n\n{emotion_section}"
+EMOTION_SECTION_TEMPLATE = (
+    "**Detected Emotions:** {emotion_details}"
+    "\nAnalyze what these emotions reveal about underlying patterns, unstated needs, or hidden beliefs. Extract insights into root causes and what drives these feelings."
+)
+EMOTIONAL_SENSING_SECTION = "**Emotional Sensing:** Analyze the emotional tone and implicit feelings in the entry text, extracting hidden emotional patterns even if emotions aren't explicitly stated."
+
+@lru_cache(maxsize=1024)
+def _render_guidance(intent_prompt: str, emotions: Tuple[Tuple[str, str], ...]) -> str:
+    """
+    Render the intent and emotion sections of the per-turn guidance
+
+    Only a handful of intents and emotion combinations occur, so the rendered
+    text is memoized instead of being rebuilt on every turn.
+
+    Args:
+        intent_prompt: Intent-specific prompt
+        emotions: Up to three (type, intensity) pairs, as strings
+
+    Returns:
+        Guidance text
+    """
+    if emotions:
+        emotion_details = ", ".join(f"{emotion_type} (intensity: {intensity})" for emotion_type, intensity in emotions)
+        emotion_section = EMOTION_SECTION_TEMPLATE.format(emotion_details=emotion_details)
+    else:
+        emotion_section = EMOTIONAL_SENSING_SECTION
+    return GUIDANCE_TEMPLATE.format(intent_prompt=intent_prompt, emotion_section=emotion_section)
+
+class AgentService:
+    """Main orchestration service for journaling assistant"""
+    
+    def __init__(self):
+        self.api_key = os.getenv("OPENAI_API_KEY")
+        
+        if not self.api_key:
+            raise ValueError("OPENAI_API_KEY must be set in environment variables")
+        
+        self.openai_client = get_openai_client()
+
+        # Runs NLU and RAG retrieval side by side, and bounds the graph lookup
+        self.executor = ThreadPoolExecutor(max_workers=16)
+
+        self._greeting_cache = TTLCache(maxsize=GREETING_CACHE_SIZE, ttl=GREETING_CACHE_TTL_SECONDS)
+        self._greeting_cache_lock = threading.Lock()
+
+        # Per-user replies keyed by message embedding; see process_message
+        self.response_cache = SemanticCache(ttl_seconds=RESPONSE_CACHE_TTL_SECONDS)
+        self._inflight_turns = SingleFlight()
+        
+        self._system_msg = SYSTEM_MESSAGE
+
     def _is_greeting(self, text: str) -> bool:
         """
         Check if the user input is a greeting/initial message
@@ -138,81 +304,141 @@ Response: "Understandable. Missing someone is complex. What exactly are you miss
         Returns:
             True if input appears to be a greeting
         """
-        greeting_patterns = [
-            "hello", "hi", "hey", "greetings", "good morning", 
-            "good afternoon", "good evening", "sup", "what's up"
-        ]
-        text_lower = text.lower().strip()
         # Check if it's just a greeting (short and matches patterns)
-        if len(text_lower.split()) <= 3:
-            for pattern in greeting_patterns:
-                if pattern in text_lower:
-                    return True
-        return False
+        return len(text) <= GREETING_MAX_CHARS and len(text.split()) <= 3 and GREETING_RE.search(text) is not None
     
-    def _generate_greeting_response(self, user_id: str, rag_context: str = "") -> str:
+    def _generate_greeting_response(self, user_id: str, rag_context: str = "", stream: bool = False) -> Union[str, Iterator[str]]:
         """
         Generate a welcome message for greetings, optionally referencing context
         
         Args:
             user_id: ID of the user
             rag_context: Context from past entries if available
+            stream: If True, return an iterator of text deltas as they are generated
             
         Returns:
-            Welcome message string
+            Welcome message string, or an iterator of text deltas when streaming
         """
         # If we have recent context, try to reference it
         if rag_context and len(rag_context) > 0:
+            topic = self._greeting_topic(rag_context[:300])
+            if topic:
+                greeting = random.choice(GREETING_TEMPLATES).format(topic=topic)
+                return iter([greeting]) if stream else greeting
+
+            cache_key = (user_id, hashlib.blake2b(rag_context[:300].encode(), digest_size=8).digest())
+            with self._greeting_cache_lock:
+                cached = self._greeting_cache.get(cache_key)
+            if cached is not None:
+                return iter([cached]) if stream else cached
+
             # Use LLM to generate contextual welcome
-            messages = [{
-                "role": "system",
-                "content": "You are Goldfish, an empathetic journaling guide. Generate a brief, warm welcome message (under 20 words) that optionally references the user's recent journal entries. Be professional yet caring. Examples: 'Welcome back. How have you been?' or 'Welcome back. How are you feeling today?'"
-            }]
-            
-            if rag_context:
-                messages.append({
+            messages = [
+                GREETING_SYSTEM_MESSAGE,
+                {
                     "role": "user",
                     "content": f"Recent context from user's journal: {rag_context[:300]}. Generate a welcome message."
-                })
+                }
+            ]
             
-            response = openai.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = self.openai_client.chat.completions.create(
+                model=CHAT_MODEL,
                 messages=messages,
                 max_tokens=50,
-                temperature=0.7
+                temperature=0.7,
+                stream=stream
             )
-            return response.choices[0].message.content.strip()
+            if stream:
+                return self._tee_deltas(self._iter_deltas(response), lambda greeting: self._cache_greeting(cache_key, greeting))
+            greeting = response.choices[0].message.content.strip()
+            self._cache_greeting(cache_key, greeting)
+            return greeting
         else:
             # Default welcome message
-            return "Welcome back. How have you been?"
+            greeting = "Welcome back. How have you been?"
+            return iter([greeting]) if stream else greeting
+
+    def _greeting_topic(self, context: str) -> Optional[str]:
+        """
+        Pick a short topic phrase out of recent context for a templated welcome
+
+        Args:
+            context: Summary or retrieved text of the user's recent entries
+
+        Returns:
+            Topic phrase addressed to the user, or None if none reads cleanly
+        """
+        match = GREETING_TOPIC_RE.search(context)
+        if not match:
+            return None
+        words = match.group(1).split()
+        words[0] = GREETING_TOPIC_DETERMINERS.get(words[0].lower(), words[0])
+        if any(word.lower() in GREETING_TOPIC_REJECT_WORDS for word in words):
+            return None
+        return " ".join(words)
+
+    def _cache_greeting(self, cache_key, greeting: str):
+        """Store a generated greeting for reuse while the user's recent context is unchanged"""
+        with self._greeting_cache_lock:
+            self._greeting_cache[cache_key] = greeting
+
+    def _tee_deltas(self, deltas: Iterator[str], on_complete: Callable[[str], None]) -> Iterator[str]:
+        """
+        Pass streamed deltas through, handing the full text to a callback once it completes
+
+        Args:
+            deltas: Text deltas of a reply
+            on_complete: Called with the stripped full text, unless it is empty
+
+        Returns:
+            Iterator of the same deltas
+        """
+        parts = []
+        for delta in deltas:
+            parts.append(delta)
+            yield delta
+        text = "".join(parts).strip()
+        if text:
+            on_complete(text)
 
     def process_message(
         self,
         user_input: str,
         conversation_history: List[Dict],
         user_id: str,
-        entry_id: Optional[str] = None
+        entry_id: Optional[str] = None,
+        history_summary: Optional[str] = None,
+        recent_entry: Optional[str] = None,
+        stream: bool = False
     ) -> Dict[str, Any]:
         """
         Main pipeline orchestration for processing a user message
-        
+
         Args:
             user_input: Current user message
             conversation_history: Current conversation history
             user_id: ID of the user
             entry_id: Optional entry ID if this is part of an existing entry
-            
+            history_summary: Running summary of earlier turns no longer in the history
+            recent_entry: Snippet of the user's latest saved entry, used to personalize greetings
+            stream: If True, "response" is an iterator of text deltas instead of a string
+
         Returns:
             Dict with response, NLU metadata, and context info
         """
+        started = time.perf_counter()
         try:
             # Check if this is a greeting - handle differently
             if self._is_greeting(user_input):
-                logger.info(f"Detected greeting from user {user_id}")
-                # Get context for personalized greeting
-                rag_result = rag_service.get_relevant_context(user_id, user_input, limit=3)
-                rag_context = rag_result.get("context", "")
-                greeting_response = self._generate_greeting_response(user_id, rag_context)
+                logger.info("Detected greeting from user %s", user_id)
+                # Personalize the greeting with the latest entry; only search past
+                # entries (an embedding + vector search) when it isn't known
+                if recent_entry:
+                    rag_context = recent_entry
+                else:
+                    rag_result = rag_service.get_relevant_context(user_id, user_input, limit=3)
+                    rag_context = rag_result.get("context", "")
+                greeting_response = self._generate_greeting_response(user_id, rag_context, stream=stream)
                 return {
                     "success": True,
                     "response": greeting_response,
@@ -222,60 +448,47 @@ Response: "Understandable. Missing someone is complex. What exactly are you miss
                     "graph_context_used": False
                 }
             
-            # Step 1: Contextual RAG retrieval
-            logger.info(f"Step 1: RAG retrieval for user {user_id}")
-            rag_result = rag_service.get_relevant_context(user_id, user_input, limit=3)
-            rag_context = rag_result.get("context", "")
-            
-            # Step 2: NLU processing
-            logger.info(f"Step 2: NLU processing")
-            nlu_result = nlu_service.process_text(user_input)
-            # log out the nlu_result
-            logger.info(f"NLU result: {nlu_result}")
-            entities = nlu_result.get("entities", [])
-            events = nlu_result.get("events", [])
-            emotions = nlu_result.get("emotions", [])
+            cache_namespace = self._response_cache_namespace(user_id, conversation_history, history_summary)
+
+            # Identical messages already being handled for this user (double submits,
+            # client retries) wait for that run's context instead of repeating it
+            turn_key = (cache_namespace, hashlib.blake2b(user_input.encode(), digest_size=16).digest())
+            turn = self._inflight_turns.do(turn_key, self._prepare_turn, user_id, user_input, cache_namespace)
+            # Copied: coalesced callers share the dict, and a timed-out graph lookup may still write to it
+            metrics = turn["timings"].copy()
+            cached = turn["cached_reply"]
+            if cached is not None:
+                return {**cached, "response": iter([cached["response"]]) if stream else cached["response"]}
+
+            query_embedding = turn["query_embedding"]
+            nlu_result = turn["nlu_result"]
             intent = nlu_result.get("intent", "general")
-            relationships = nlu_result.get("relationships", [])
-            
-            # Step 3: GraphRAG query - get related entities/context
-            logger.info(f"Step 3: GraphRAG query")
-            graph_context = ""
-            if entities:
-                # Get graph context for mentioned entities
-                graph_results = []
-                for entity in entities[:3]:  # Limit to first 3 entities
-                    entity_name = entity.get("name", "")
-                    if entity_name:
-                        graph_result = neo4j_service.get_user_graph_context(user_id, entity_name, limit=2)
-                        if graph_result.get("success") and graph_result.get("context"):
-                            graph_results.append(graph_result["context"])
-                
-                if graph_results:
-                    graph_context = " ".join(graph_results[:2])  # Limit to 2 contexts
-
-            logger.info(f"Graph context: {graph_context}")
+            rag_context = turn["rag_context"]
+            graph_context = turn["graph_context"]
             
             # Step 4: GraphRAG insertion - store entities/relationships
             # Note: We'll insert when saving the entry, not on every message
             # But we could optionally do it here for real-time graph updates
             
             # Step 5: Intent-based routing
-            logger.info(f"Step 4: Intent routing - {intent}")
             intent_prompt = self._get_intent_prompt(intent)
             
-            # Step 6: Response generation with enhanced context
-            logger.info(f"Step 5: Response generation")
-            response = self._generate_response(
-                user_input=user_input,
-                conversation_history=conversation_history,
-                rag_context=rag_context,
-                graph_context=graph_context,
-                nlu_metadata=nlu_result,
-                intent_prompt=intent_prompt
-            )
-            
-            return {
+            # Step 6: Response generation with enhanced context; when streaming
+            # this times how long the stream takes to open, not the whole reply
+            with PhaseTimer(metrics, "llm"):
+                response = self._generate_response(
+                    user_input=user_input,
+                    conversation_history=conversation_history,
+                    rag_context=rag_context,
+                    graph_context=graph_context,
+                    nlu_metadata=nlu_result,
+                    intent_prompt=intent_prompt,
+                    history_summary=history_summary,
+                    user_id=user_id,
+                    stream=stream
+                )
+
+            result = {
                 "success": True,
                 "response": response,
                 "nlu_metadata": nlu_result,
@@ -283,6 +496,25 @@ Response: "Understandable. Missing someone is complex. What exactly are you miss
                 "rag_context_used": bool(rag_context),
                 "graph_context_used": bool(graph_context)
             }
+
+            # Replies drawing on the knowledge graph are specific to the entities
+            # mentioned, so only context-free and past-entry replies are reused
+            if query_embedding is not None and not graph_context:
+                def cache_response(text: str):
+                    self.response_cache.set(cache_namespace, query_embedding, {**result, "response": text})
+
+                if stream:
+                    result["response"] = self._tee_deltas(response, cache_response)
+                else:
+                    cache_response(response)
+
+            metrics["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            logger.info(
+                "Turn timings for user %s: %s",
+                user_id,
+                orjson.dumps({**metrics, "intent": intent, "graph_hit": bool(graph_context)}).decode()
+            )
+            return result
             
         except Exception as e:
             logger.error(f"Process message error: {str(e)}")
@@ -292,6 +524,253 @@ Response: "Understandable. Missing someone is complex. What exactly are you miss
                 "response": "I'm having trouble processing that right now. Could you try again?"
             }
     
+    def invalidate_user_cache(self, user_id: str):
+        """
+        Forget cached replies and retrievals for a user whose entries just changed
+
+        Args:
+            user_id: ID of the user
+        """
+        self.response_cache.clear_namespaces(f"{user_id}:")
+        rag_service.invalidate_user_cache(user_id)
+
+    def _response_cache_namespace(
+        self,
+        user_id: str,
+        conversation_history: List[Dict],
+        history_summary: Optional[str] = None
+    ) -> str:
+        """
+        Get the response cache partition for a user at the current point of their conversation
+
+        Args:
+            user_id: ID of the user
+            conversation_history: Current conversation history
+            history_summary: Running summary of earlier turns no longer in the history
+
+        Returns:
+            Namespace of the form "<user_id>:<history digest>"
+        """
+        recent = [
+            (turn.get("role", ""), turn.get("content", ""))
+            for turn in conversation_history[-RESPONSE_CACHE_HISTORY_MESSAGES:]
+        ]
+        digest = hashlib.blake2b(orjson.dumps([history_summary or "", recent]), digest_size=16).hexdigest()
+        return f"{user_id}:{digest}"
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters of the caches on the reply path
+
+        Returns:
+            Dict with stats for the response, RAG and graph context caches
+        """
+        return {
+            "response": self.response_cache.stats(),
+            "rag": rag_service.cache_stats(),
+            "graph": neo4j_service.cache_stats()
+        }
+
+    def _prepare_turn(self, user_id: str, user_input: str, cache_namespace: str) -> Dict[str, Any]:
+        """
+        Gather everything a reply needs that doesn't depend on the conversation history
+
+        Args:
+            user_id: ID of the user
+            user_input: Current user message
+            cache_namespace: Response cache partition for this point of the conversation
+
+        Returns:
+            Dict with cached_reply (a response cache hit, or None), query_embedding,
+            nlu_result, rag_context, graph_context and per-phase timings
+        """
+        # Phases overlap, so each is timed where it runs rather than by the waits below
+        timings = {}
+
+        # NLU is the slowest step and needs nothing else, so it starts first
+        nlu_future = self.executor.submit(timed, timings, "nlu", nlu_service.process_text, user_input)
+
+        # Embed the message once: it keys the response cache and drives RAG search
+        try:
+            query_embedding = timed(timings, "embed", embedding_service.generate_embedding, user_input)
+        except Exception as e:
+            logger.warning(f"Message embedding failed, skipping response cache: {str(e)}")
+            query_embedding = None
+
+        if query_embedding is not None:
+            cached = self.response_cache.get(cache_namespace, query_embedding)
+            if cached is not None:
+                logger.info("Response cache hit for user %s", user_id)
+                nlu_future.cancel()
+                return {"cached_reply": cached, "timings": timings}
+
+        # Step 1: Contextual RAG retrieval, alongside NLU since neither needs the other
+        rag_future = self.executor.submit(
+            timed, timings, "rag", rag_service.get_relevant_context, user_id, user_input, 3, query_embedding
+        )
+        rag_deadline = time.monotonic() + RAG_TIMEOUT_SECONDS
+
+        # Step 2: NLU processing
+        nlu_result = nlu_future.result()
+        # The full NLU dump is large; only format it when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("NLU result: %s", nlu_result)
+        entities = nlu_result.get("entities", [])
+
+        # Step 3: GraphRAG query - get related entities/context
+        graph_context = ""
+        # Get graph context for the first 3 mentioned entities in one query
+        entity_names = [entity["name"] for entity in entities[:3] if entity.get("name")]
+        if entity_names:
+            graph_future = self.executor.submit(
+                timed, timings, "graph", neo4j_service.get_user_graph_context_batch, user_id, entity_names, 2
+            )
+            try:
+                graph_result = graph_future.result(timeout=GRAPH_TIMEOUT_SECONDS)
+                if graph_result.get("success") and graph_result.get("contexts"):
+                    graph_context = " ".join(pack_to_token_budget(graph_result["contexts"], MAX_GRAPH_CONTEXT_TOKENS))
+            except FutureTimeoutError:
+                logger.warning(f"Graph context timed out after {GRAPH_TIMEOUT_SECONDS}s, continuing without it")
+
+        logger.debug("Graph context: %s", graph_context)
+
+        # Retrieval has been running alongside NLU and the graph lookup, so only
+        # what is left of its budget is waited out here
+        rag_context = ""
+        try:
+            rag_result = rag_future.result(timeout=max(0.0, rag_deadline - time.monotonic()))
+            rag_context = rag_result.get("context", "")
+        except FutureTimeoutError:
+            logger.warning(f"RAG context timed out after {RAG_TIMEOUT_SECONDS}s, continuing without it")
+
+        return {
+            "cached_reply": None,
+            "query_embedding": query_embedding,
+            "nlu_result": nlu_result,
+            "rag_context": rag_context,
+            "graph_context": graph_context,
+            "timings": timings
+        }
+
+    def process_message_batch(self, requests: List[Tuple[str, List[Dict], str]]) -> Dict[str, Any]:
+        """
+        Queue replies for messages that nobody is waiting on (journal replays, offline
+        jobs) through the OpenAI Batch API: half the price, results within 24 hours
+
+        Context is gathered now, the same way as in process_message; only the reply
+        generation is deferred. Collect the replies with collect_message_batch.
+
+        Args:
+            requests: (user_input, conversation_history, user_id) tuples
+
+        Returns:
+            Dict with the batch ID and one custom_id per request, in order
+        """
+        try:
+            rows = []
+            custom_ids = []
+            for user_input, conversation_history, user_id in requests:
+                rag_context = rag_service.get_relevant_context(user_id, user_input, limit=3).get("context", "")
+                nlu_result = nlu_service.process_text(user_input)
+                intent = nlu_result.get("intent", "general")
+
+                graph_context = ""
+                entity_names = [entity["name"] for entity in nlu_result.get("entities", [])[:3] if entity.get("name")]
+                if entity_names:
+                    graph_result = neo4j_service.get_user_graph_context_batch(user_id, entity_names, limit_per=2)
+                    graph_context = " ".join(pack_to_token_budget(graph_result.get("contexts", []), MAX_GRAPH_CONTEXT_TOKENS))
+
+                messages = self._build_messages(
+                    user_input, conversation_history, rag_context, graph_context,
+                    nlu_result, self._get_intent_prompt(intent)
+                )
+                custom_id = f"{user_id}:{uuid.uuid4().hex}"
+                custom_ids.append(custom_id)
+                rows.append(orjson.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        **RESPONSE_PARAMS,
+                        "max_tokens": self._reply_token_budget(user_input),
+                        "messages": messages,
+                        "prompt_cache_key": user_id
+                    }
+                }))
+
+            if not rows:
+                return {"success": False, "error": "No messages to batch"}
+
+            input_file = self.openai_client.files.create(
+                file=("messages.jsonl", b"\n".join(rows) + b"\n"),
+                purpose="batch"
+            )
+            batch = self.openai_client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            logger.info(f"Queued {len(rows)} replies as batch {batch.id}")
+
+            return {
+                "success": True,
+                "batch_id": batch.id,
+                "custom_ids": custom_ids
+            }
+
+        except Exception as e:
+            logger.error(f"Process message batch error: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
+    def collect_message_batch(self, batch_id: str) -> Dict[str, Any]:
+        """
+        Fetch the replies of a batch queued by process_message_batch
+
+        Args:
+            batch_id: ID returned by process_message_batch
+
+        Returns:
+            Dict with the batch status and, once completed, replies keyed by custom_id
+        """
+        try:
+            batch = self.openai_client.batches.retrieve(batch_id)
+            if batch.status != "completed" or not batch.output_file_id:
+                return {"success": True, "status": batch.status, "responses": {}}
+
+            responses = {}
+            for line in self.openai_client.files.content(batch.output_file_id).text.splitlines():
+                result = orjson.loads(line)
+                response = result.get("response") or {}
+                if response.get("status_code") == 200:
+                    responses[result["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+
+            return {"success": True, "status": batch.status, "responses": responses}
+
+        except Exception as e:
+            logger.error(f"Collect message batch error: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def _reply_token_budget(self, user_input: str) -> int:
+        """
+        Pick the reply length cap for a message
+
+        Args:
+            user_input: Current user message
+
+        Returns:
+            CLOSING_REPLY_TOKENS when the user is closing the session, otherwise the default cap
+        """
+        text = user_input.lower()
+        if any(keyword in text for keyword in CLOSING_KEYWORDS):
+            return CLOSING_REPLY_TOKENS
+        return RESPONSE_PARAMS["max_tokens"]
+
     def _get_intent_prompt(self, intent: str) -> str:
         """
         Get intent-specific prompt enhancement focused on emotional exploration
@@ -302,28 +781,21 @@ Response: "Understandable. Missing someone is complex. What exactly are you miss
         Returns:
             Intent-specific prompt addition
         """
-        intent_prompts = {
-            "self-reflection": "Engage conversationally to help them reflect on patterns in their thinking. Use warm, simple language, and if they show clear insight, acknowledge it warmly.",
-            "planning": "Gently explore their plans through conversation. What feelings or worries might be influencing this decision?",
-            "emotional-release": "This entry has strong feelings. With warmth, help them understand what's behind these emotions using simple, gentle questions.",
-            "insight-generation": "Notice patterns in what they're sharing. Use conversational language, and if they show awareness, celebrate that insight.",
-            "general": "Engage warmly and simply to understand what they're feeling and thinking. Use easy conversational questions, and acknowledge when they show progress."
-        }
-        
-        return intent_prompts.get(intent, intent_prompts["general"])
+        return INTENT_PROMPTS.get(intent, INTENT_PROMPTS["general"])
     
-    def _generate_response(
+    def _build_messages(
         self,
         user_input: str,
         conversation_history: List[Dict],
         rag_context: str,
         graph_context: str,
         nlu_metadata: Dict,
-        intent_prompt: str
-    ) -> str:
+        intent_prompt: str,
+        history_summary: Optional[str] = None
+    ) -> List[Dict]:
         """
-        Generate response using LLM with all context
-        
+        Build the chat messages for a reply with all context
+
         Args:
             user_input: Current user message
             conversation_history: Conversation history
@@ -331,12 +803,20 @@ Response: "Understandable. Missing someone is complex. What exactly are you miss
             graph_context: Graph context from knowledge graph
             nlu_metadata: NLU extraction results
             intent_prompt: Intent-specific prompt
-            
+            history_summary: Running summary of earlier turns no longer in the history
+
         Returns:
-            Generated response text
+            Messages for chat.completions.create
         """
-        # Build enhanced system prompt
-        enhanced_prompt = self.system_prompt
+        # Per-turn guidance goes in its own message just before the user turn, so the
+        # system prompt stays byte-identical across turns and its prefix stays cached
+        
+        # Intent guidance plus detailed emotion analysis for better emotional sensing;
+        # nlu_service normalizes emotions to dicts with type and intensity
+        emotions = tuple(
+            (str(e["type"]), str(e["intensity"])) for e in (nlu_metadata.get("emotions") or [])[:3]
+        )
+        turn_prompt = _render_guidance(intent_prompt, emotions)
         
         # Add context sections
         context_parts = []
@@ -348,50 +828,97 @@ Response: "Understandable. Missing someone is complex. What exactly are you miss
             context_parts.append(f"Graph context: {graph_context}")
         
         if context_parts:
-            enhanced_prompt += "\n\n**Context from Past Entries:**\n" + "\n".join(context_parts)
-            enhanced_prompt += "\n\nUse this context subtly and naturally, but don't over-reference it. Reference it like `I remember you mentioned X some time ago — how is that going lately?`"
-        
-        # Add intent guidance
-        enhanced_prompt += f"\n\n**Current Task:** {intent_prompt}"
-        
-        # Add strict format reminder
-        enhanced_prompt += "\n\n**CRITICAL: Response Format (MUST FOLLOW)**\n- ALWAYS start with a conversational filler: \"I see...\" / \"Makes sense...\" / \"Understandable...\" / \"I hear you...\"\n- Brief observation about their situation (1-2 clauses) using simple, everyday language\n- ONE gentle, conversational question OR acknowledge their progress if they show insight\n- Keep it warm and conversational—like talking to a caring friend\n- Use simple language—avoid complex psychological terms\n- Total response under 50 words\n- Make it feel natural and empathetic"
-        
-        # Add detailed emotion analysis for better emotional sensing
-        emotions = nlu_metadata.get("emotions", [])
-        if emotions:
-            emotion_details = []
-            for e in emotions[:3]:
-                emotion_type = e.get("type", "")
-                intensity = e.get("intensity", "medium") if isinstance(e, dict) and "intensity" in e else "medium"
-                emotion_details.append(f"{emotion_type} (intensity: {intensity})")
-            
-            if emotion_details:
-                enhanced_prompt += f"\n\n**Detected Emotions:** {', '.join(emotion_details)}"
-                enhanced_prompt += "\nAnalyze what these emotions reveal about underlying patterns, unstated needs, or hidden beliefs. Extract insights into root causes and what drives these feelings."
-        else:
-            enhanced_prompt += "\n\n**Emotional Sensing:** Analyze the emotional tone and implicit feelings in the entry text, extracting hidden emotional patterns even if emotions aren't explicitly stated."
+            # Cap retrieved context; past the budget the least relevant lines are dropped
+            context_text = trim_lines_to_token_budget("\n".join(context_parts), MAX_CONTEXT_TOKENS)
+            turn_prompt = CONTEXT_SECTION_TEMPLATE.format(context=context_text) + "\n\n" + turn_prompt
         
         # Prepare messages
-        messages = [{"role": "system", "content": enhanced_prompt}]
+        messages = [self._system_msg]
         
-        # Add recent conversation history
-        messages.extend(conversation_history[-10:])
+        # Earlier turns that were rolled up out of the raw history
+        if history_summary:
+            messages.append({"role": "system", "content": f"Previous session summary:\n{history_summary}"})
         
-        # Add current user message
+        # Add as much recent conversation history as fits the token budget, with
+        # each earlier turn capped so long entries don't push the rest out
+        history = cap_message_tokens(conversation_history, MAX_HISTORY_MESSAGE_TOKENS)
+        messages.extend(trim_to_token_budget(history, MAX_HISTORY_TOKENS))
+        
+        # Add this turn's guidance, then the current user message
+        messages.append({"role": "system", "content": turn_prompt})
         messages.append({"role": "user", "content": user_input})
         
-        # Generate response with tighter parameters for concise output
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            max_tokens=100,  # Reduced for concise responses
-            temperature=0.7,
-            frequency_penalty=0.2,  # Slightly higher to encourage variety
-            presence_penalty=0.1
+        return messages
+
+    def _generate_response(
+        self,
+        user_input: str,
+        conversation_history: List[Dict],
+        rag_context: str,
+        graph_context: str,
+        nlu_metadata: Dict,
+        intent_prompt: str,
+        history_summary: Optional[str] = None,
+        user_id: Optional[str] = None,
+        stream: bool = False
+    ) -> Union[str, Iterator[str]]:
+        """
+        Generate response using LLM with all context
+
+        Args:
+            user_input: Current user message
+            conversation_history: Conversation history
+            rag_context: RAG context from past entries
+            graph_context: Graph context from knowledge graph
+            nlu_metadata: NLU extraction results
+            intent_prompt: Intent-specific prompt
+            history_summary: Running summary of earlier turns no longer in the history
+            user_id: ID of the user, used to keep their requests on one warm prompt cache
+            stream: If True, return an iterator of text deltas as they are generated
+
+        Returns:
+            Generated response text, or an iterator of text deltas when streaming
+        """
+        messages = self._build_messages(
+            user_input, conversation_history, rag_context, graph_context,
+            nlu_metadata, intent_prompt, history_summary
         )
         
+        response = self.openai_client.chat.completions.create(
+            messages=messages,
+            stream=stream,
+            # The static system message (~1.4k tokens) is a cacheable prefix; routing a
+            # user's requests together also keeps their earlier turns in that prefix
+            extra_body={"prompt_cache_key": user_id} if user_id else None,
+            **{**RESPONSE_PARAMS, "max_tokens": self._reply_token_budget(user_input)}
+        )
+
+        if stream:
+            return self._iter_deltas(response)
+
+        usage = getattr(response, "usage", None)
+        details = getattr(usage, "prompt_tokens_details", None) if usage else None
+        if details is not None:
+            logger.info("Prompt tokens: %s, cached: %s", usage.prompt_tokens, details.cached_tokens)
+
         return response.choices[0].message.content.strip()
+
+    def _iter_deltas(self, completion_stream) -> Iterator[str]:
+        """
+        Yield text deltas from a streamed chat completion
+
+        Args:
+            completion_stream: Stream returned by chat.completions.create(stream=True)
+
+        Returns:
+            Iterator of non-empty content deltas
+        """
+        for chunk in completion_stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
     
     def route_by_intent(self, intent: str, nlu_metadata: Dict, context: Dict) -> str:
         """
@@ -405,16 +932,20 @@ Response: "Understandable. Missing someone is complex. What exactly are you miss
         Returns:
             Workflow identifier
         """
-        intent_workflows = {
-            "self-reflection": "reflective_response",
-            "planning": "planning_tracking",
-            "emotional-release": "emotional_grounding",
-            "insight-generation": "insight_generation",
-            "general": "reflective_response"
-        }
-        
-        return intent_workflows.get(intent, "reflective_response")
+        return INTENT_WORKFLOWS.get(intent, "reflective_response")
+
+# Shared instance, created on first use so importing this module has no side effects
+_agent_service: Optional[AgentService] = None
+
+def get_agent_service() -> AgentService:
+    """
+    Get the shared AgentService instance.
+
+    Raises ValueError on first use if OPENAI_API_KEY is not set.
+    """
+    global _agent_service
+    if _agent_service is None:
+        _agent_service = AgentService()
 
-# Global instance
-agent_service = AgentService()
+    return _agent_service
 
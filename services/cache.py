@@ -0,0 +1,71 @@
+"""
+Per-user TTL cache for memoizing retrieval results
+"""
+from typing import Any, Dict, Hashable, Optional, Tuple
+import threading
+from cachetools import TTLCache
+
+class UserTTLCache:
+    """Thread-safe TTL cache whose keys start with a user ID, so one user's entries can be dropped together"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, Hashable]) -> Optional[Any]:
+        """
+        Get a cached value
+
+        Args:
+            key: Tuple whose first item is the user ID
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key: Tuple[str, Hashable], value: Any):
+        """
+        Cache a value
+
+        Args:
+            key: Tuple whose first item is the user ID
+            value: Value to cache
+        """
+        with self._lock:
+            self._cache[key] = value
+
+    def invalidate_user(self, user_id: str):
+        """
+        Drop every entry cached for a user, e.g. after they save a new entry
+
+        Args:
+            user_id: ID of the user
+        """
+        with self._lock:
+            for key in [key for key in self._cache if key[0] == user_id]:
+                self._cache.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters for monitoring
+
+        Returns:
+            Dict with hits, misses, hit_rate and the number of cached entries
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._cache)
+            }
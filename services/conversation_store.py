@@ -0,0 +1,165 @@
+"""
+Conversation store for keeping in-progress chat history in Redis
+"""
+from typing import List, Dict
+import logging
+import orjson
+from services.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# In-progress conversations expire if the user walks away without saving
+CONVERSATION_TTL_SECONDS = 24 * 60 * 60
+
+# The latest saved entry outlives conversations so returning users can be greeted with it
+RECENT_ENTRY_TTL_SECONDS = 30 * 24 * 60 * 60
+
+class ConversationStore:
+    """Service for storing per-user conversation history as Redis lists"""
+
+    def __init__(self, client=None):
+        self.client = client or get_redis_client()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether a Redis backend is configured"""
+        return self.client is not None
+
+    def _history_key(self, user_id: str) -> str:
+        return f"conversation:{user_id}:history"
+
+    def _summary_key(self, user_id: str) -> str:
+        return f"conversation:{user_id}:summary"
+
+    def _recent_entry_key(self, user_id: str) -> str:
+        return f"recent:{user_id}"
+
+    def get_history(self, user_id: str) -> List[Dict]:
+        """
+        Get the current conversation history for a user
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            List of conversation turns, oldest first
+        """
+        return [orjson.loads(item) for item in self.client.lrange(self._history_key(user_id), 0, -1)]
+
+    def append_exchange(self, user_id: str, user_message: str, ai_response: str, max_messages: int) -> List[Dict]:
+        """
+        Append a user/assistant exchange and trim the history to its newest messages
+
+        Args:
+            user_id: ID of the user
+            user_message: Message sent by the user
+            ai_response: Assistant reply
+            max_messages: Maximum number of messages to keep
+
+        Returns:
+            The conversation history after the append
+        """
+        key = self._history_key(user_id)
+        pipe = self.client.pipeline()
+        pipe.rpush(
+            key,
+            orjson.dumps({"role": "user", "content": user_message}),
+            orjson.dumps({"role": "assistant", "content": ai_response})
+        )
+        pipe.ltrim(key, -max_messages, -1)
+        pipe.expire(key, CONVERSATION_TTL_SECONDS)
+        pipe.lrange(key, 0, -1)
+        items = pipe.execute()[-1]
+        return [orjson.loads(item) for item in items]
+
+    def keep_latest(self, user_id: str, count: int):
+        """
+        Drop all but the newest messages of a user's history
+
+        Args:
+            user_id: ID of the user
+            count: Number of messages to keep
+        """
+        self.client.ltrim(self._history_key(user_id), -count, -1)
+
+    def get_summary(self, user_id: str) -> str:
+        """
+        Get the running summary of turns rolled out of the history
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            Summary string, empty if none
+        """
+        value = self.client.get(self._summary_key(user_id))
+        return value.decode() if value else ""
+
+    def set_summary(self, user_id: str, summary: str):
+        """
+        Store the running summary for a user's conversation
+
+        Args:
+            user_id: ID of the user
+            summary: Summary string
+        """
+        self.client.set(self._summary_key(user_id), summary, ex=CONVERSATION_TTL_SECONDS)
+
+    def get_recent_entry(self, user_id: str) -> str:
+        """
+        Get a snippet of the user's most recently saved entry
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            Snippet string, empty if none
+        """
+        value = self.client.get(self._recent_entry_key(user_id))
+        return value.decode() if value else ""
+
+    def set_recent_entry(self, user_id: str, snippet: str):
+        """
+        Store a snippet of the user's most recently saved entry
+
+        Args:
+            user_id: ID of the user
+            snippet: Snippet string
+        """
+        self.client.set(self._recent_entry_key(user_id), snippet, ex=RECENT_ENTRY_TTL_SECONDS)
+
+    def claim_turn(self, user_id: str, turn_id: str, ttl_seconds: int) -> bool:
+        """
+        Mark a streamed turn as committed, unless it already was
+
+        Args:
+            user_id: ID of the user
+            turn_id: One-time ID of the turn
+            ttl_seconds: How long to remember the turn; at least as long as its token is valid
+
+        Returns:
+            True if this call claimed the turn, False if it was claimed before
+        """
+        return bool(self.client.set(f"turn:{user_id}:{turn_id}", 1, nx=True, ex=ttl_seconds))
+
+    def release_turn(self, user_id: str, turn_id: str):
+        """
+        Forget a claimed turn, e.g. when recording it failed and the client may retry
+
+        Args:
+            user_id: ID of the user
+            turn_id: One-time ID of the turn
+        """
+        self.client.delete(f"turn:{user_id}:{turn_id}")
+
+    def clear(self, user_id: str):
+        """
+        Remove a user's conversation history and running summary
+
+        Args:
+            user_id: ID of the user
+        """
+        self.client.delete(self._history_key(user_id), self._summary_key(user_id))
+
+# Global instance
+conversation_store = ConversationStore()
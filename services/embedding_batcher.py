@@ -0,0 +1,118 @@
+"""
+Embedding batcher for coalescing concurrent single-text embedding requests
+"""
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, List, Tuple
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Inputs per embeddings request; well under the API's 2048-input cap so one
+# batch of long messages stays inside its per-request token limit
+EMBEDDING_BATCH_MAX_INPUTS = 256
+
+# How long a caller waits on its batch before embedding its text directly; a
+# stuck batch request then only delays, rather than blocks, every other caller
+EMBEDDING_BATCH_TIMEOUT_SECONDS = 10.0
+
+class EmbeddingBatcher:
+    """Batches embedding requests from concurrent callers into single API calls
+
+    One worker sends whatever has queued up as one request; texts that arrive
+    while that request is in flight go out together in the next one. A lone
+    request is sent immediately, so batching only kicks in under load.
+    """
+
+    def __init__(
+        self,
+        embed_many: Callable[[List[str]], List[List[float]]],
+        max_batch: int = EMBEDDING_BATCH_MAX_INPUTS,
+        max_wait_seconds: float = 0.0,
+        timeout_seconds: float = EMBEDDING_BATCH_TIMEOUT_SECONDS
+    ):
+        self._embed_many = embed_many
+        self.max_batch = max_batch
+        self.max_wait_seconds = max_wait_seconds
+        self.timeout_seconds = timeout_seconds
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def embed(self, text: str) -> List[float]:
+        """
+        Embed one text as part of the next batch
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            Embedding values
+        """
+        future = Future()
+        self._queue.put((text, future))
+        self._ensure_worker()
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except FutureTimeoutError:
+            # Cancelling only succeeds while the text is still queued; if its batch is
+            # already in flight, its result is simply dropped
+            future.cancel()
+            logger.warning(f"Batched embedding timed out after {self.timeout_seconds}s, embedding directly")
+            return self._embed_many([text])[0]
+
+    def _ensure_worker(self):
+        # Started on first use, after gevent has patched threading in production,
+        # and restarted if it has died
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def _next_batch(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        # Skip texts whose callers timed out and embedded them directly
+        return [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            try:
+                self._run_batch(self._next_batch())
+            except Exception as e:
+                # Keep the worker alive for the callers queued behind this batch
+                logger.error(f"Embedding batcher error: {str(e)}")
+
+    def _run_batch(self, batch: List[Tuple[str, Future]]):
+        if not batch:
+            return
+        try:
+            vectors = self._embed_many([text for text, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # One bad input fails the whole request; retry individually so it only fails
+            # its own caller, on a separate thread so the next batch isn't held up
+            logger.warning(f"Batched embedding of {len(batch)} texts failed, retrying one by one: {str(e)}")
+            threading.Thread(target=self._retry_individually, args=(batch,), name="embedding-retry", daemon=True).start()
+            return
+
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+    def _retry_individually(self, batch: List[Tuple[str, Future]]):
+        for text, future in batch:
+            try:
+                future.set_result(self._embed_many([text])[0])
+            except Exception as single_error:
+                future.set_exception(single_error)
@@ -1,11 +1,17 @@
 """
 Embedding service for OpenAI embeddings and vector storage
 """
-from typing import List, Dict, Any, Tuple
-import openai
+from typing import List, Dict, Any, Tuple, Optional
+from services.openai_client import get_openai_client
+from services.embedding_batcher import EmbeddingBatcher, EMBEDDING_BATCH_MAX_INPUTS
+from array import array
 import os
+import hashlib
 import logging
+import threading
+from cachetools import LRUCache
 from supabase import Client
+from postgrest import ReturnMethod
 from services.supabase_client import supabase_client
 from dotenv import load_dotenv
 
@@ -14,6 +20,14 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Stored vectors and query vectors must come from the same model
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Embeddings of recent messages, keyed by model and content, so repeated text skips the API;
+# vectors are held as float32 arrays (~6 KB each instead of ~50 KB as a float list)
+EMBEDDING_CACHE_SIZE = 4096
+EMBEDDING_CACHE_MAX_TEXT_CHARS = 2000
+
 class EmbeddingService:
     """Service for generating and managing embeddings"""
     
@@ -25,11 +39,18 @@ class EmbeddingService:
             raise ValueError("OPENAI_API_KEY must be set in environment variables")
         
         # Initialize OpenAI client
-        openai.api_key = self.api_key
+        self.openai_client = get_openai_client()
+
+        # Single-text embeddings from concurrent chat turns share API requests
+        self.batcher = EmbeddingBatcher(self.generate_embeddings)
+        
+        self._cache = LRUCache(maxsize=EMBEDDING_CACHE_SIZE)
+        self._cache_lock = threading.Lock()
     
     def generate_embedding(self, text: str) -> List[float]:
         """
-        Generate embedding for text using OpenAI
+        Generate embedding for text using OpenAI, batched with concurrent callers
+        and memoized by content
         
         Args:
             text: Text to embed
@@ -37,15 +58,53 @@ class EmbeddingService:
         Returns:
             List of embedding values
         """
+        if not text.strip():
+            raise ValueError("Cannot embed empty text")
+        
+        cache_key = None
+        if len(text) <= EMBEDDING_CACHE_MAX_TEXT_CHARS:
+            cache_key = hashlib.blake2b(f"{EMBEDDING_MODEL}\0{text}".encode(), digest_size=16).digest()
+            with self._cache_lock:
+                cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached.tolist()
+        
         try:
-            response = openai.embeddings.create(
-                model="text-embedding-3-small",
-                input=text
-            )
-            return response.data[0].embedding
+            embedding = self.batcher.embed(text)
         except Exception as e:
             logger.error(f"Generate embedding error: {str(e)}")
             raise e
+        
+        if cache_key is not None:
+            with self._cache_lock:
+                self._cache[cache_key] = array('f', embedding)
+        return embedding
+    
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for several texts, one OpenAI request per
+        EMBEDDING_BATCH_MAX_INPUTS texts
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            List of embeddings, in the same order as texts
+        """
+        if not texts:
+            return []
+        try:
+            embeddings = []
+            for start in range(0, len(texts), EMBEDDING_BATCH_MAX_INPUTS):
+                response = self.openai_client.embeddings.create(
+                    model=EMBEDDING_MODEL,
+                    input=texts[start:start + EMBEDDING_BATCH_MAX_INPUTS]
+                )
+                embeddings.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+            return embeddings
+        except Exception as e:
+            logger.error(f"Generate embeddings error: {str(e)}")
+            raise e
     
     def chunk_conversation(self, conversation_history: List[Dict]) -> List[str]:
         """
@@ -59,23 +118,25 @@ class EmbeddingService:
         """
         chunks = []
         
-        # Group consecutive user-assistant pairs
-        current_chunk = ""
+        # Group consecutive user-assistant pairs; lines are collected and joined
+        # once per chunk
+        lines = []
         for turn in conversation_history:
             role = turn.get("role", "")
             content = turn.get("content", "")
             
             if role == "user":
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = ""
-                current_chunk = f"User: {content}\n"
+                if lines:
+                    chunks.append("\n".join(lines).strip())
+                    lines.clear()
+                lines.append(f"User: {content}")
             elif role == "assistant":
-                current_chunk += f"Assistant: {content}\n"
+                lines.append(f"Assistant: {content}")
         
         # Add the last chunk if it exists
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+        last_chunk = "\n".join(lines).strip()
+        if last_chunk:
+            chunks.append(last_chunk)
         
         # If no chunks were created, create one from the entire conversation
         if not chunks:
@@ -100,26 +161,28 @@ class EmbeddingService:
             Dict with success status
         """
         try:
-            vectors_to_insert = []
-            
-            for chunk in chunks:
-                # Generate embedding for this chunk
-                embedding = self.generate_embedding(chunk)
-                
-                vectors_to_insert.append({
+            # Embed every chunk in one API call
+            embeddings = self.generate_embeddings(chunks)
+            vectors_to_insert = [
+                {
                     "entry_id": entry_id,
                     "user_id": user_id,
                     "chunk_text": chunk,
                     "embedding": embedding
-                })
+                }
+                for chunk, embedding in zip(chunks, embeddings)
+            ]
             
-            # Insert all vectors at once
-            response = self.client.table("journal_entry_vectors").insert(vectors_to_insert).execute()
+            # Insert all vectors at once; the rows aren't read back, so don't have
+            # PostgREST serialize them (embeddings included) into the response
+            self.client.table("journal_entry_vectors")\
+                .insert(vectors_to_insert, returning=ReturnMethod.minimal)\
+                .execute()
             
             return {
                 "success": True,
-                "vectors_stored": len(response.data),
-                "message": f"Stored {len(response.data)} embeddings"
+                "vectors_stored": len(vectors_to_insert),
+                "message": f"Stored {len(vectors_to_insert)} embeddings"
             }
             
         except Exception as e:
@@ -129,7 +192,13 @@ class EmbeddingService:
                 "error": str(e)
             }
     
-    def search_similar_entries(self, user_id: str, query_text: str, limit: int = 5) -> Dict[str, Any]:
+    def search_similar_entries(
+        self,
+        user_id: str,
+        query_text: str,
+        limit: int = 5,
+        query_embedding: Optional[List[float]] = None
+    ) -> Dict[str, Any]:
         """
         Search for similar entries using vector similarity
         
@@ -137,13 +206,15 @@ class EmbeddingService:
             user_id: ID of the user
             query_text: Text to search for
             limit: Maximum number of results
+            query_embedding: Embedding of query_text, if the caller already has it
             
         Returns:
             Dict containing similar entries
         """
         try:
             # Generate embedding for query
-            query_embedding = self.generate_embedding(query_text)
+            if query_embedding is None:
+                query_embedding = self.generate_embedding(query_text)
             
             # Use Supabase's vector similarity search
             response = self.client.rpc(
@@ -165,7 +236,60 @@ class EmbeddingService:
             logger.error(f"Search similar entries error: {str(e)}")
             # Fallback to simple text search if vector search fails
             return self._fallback_text_search(user_id, query_text, limit)
-    
+
+    def search_similar_entries_batch(self, user_id: str, queries: List[str], limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Search for similar entries for several queries at once
+
+        Embeds all queries in one request and runs every vector search in one
+        match_documents_batch call. Falls back to one search per query if the
+        function is not installed.
+
+        Args:
+            user_id: ID of the user
+            queries: Texts to search for
+            limit: Maximum number of results per query
+
+        Returns:
+            List of search results, one dict per query in the same order
+        """
+        if not queries:
+            return []
+
+        try:
+            query_embeddings = self.generate_embeddings(queries)
+        except Exception:
+            return [self.search_similar_entries(user_id, query, limit) for query in queries]
+
+        try:
+            response = self.client.rpc(
+                "match_documents_batch",
+                {
+                    "query_embeddings": query_embeddings,
+                    "p_user_id": user_id,
+                    "match_count": limit
+                }
+            ).execute()
+        except Exception as e:
+            logger.warning(f"match_documents_batch RPC failed, searching one query at a time: {str(e)}")
+            return [
+                self.search_similar_entries(user_id, query, limit, query_embedding=embedding)
+                for query, embedding in zip(queries, query_embeddings)
+            ]
+
+        # Rows come back tagged with the 1-based position of their query
+        grouped = [[] for _ in queries]
+        for row in response.data:
+            grouped[row.pop("query_index") - 1].append(row)
+        return [
+            {
+                "success": True,
+                "results": results,
+                "count": len(results)
+            }
+            for results in grouped
+        ]
+
     def _fallback_text_search(self, user_id: str, query_text: str, limit: int) -> Dict[str, Any]:
         """
         Fallback text search if vector search fails
@@ -3,6 +3,7 @@ Journal service for managing journal entries in Supabase
 """
 from typing import List, Dict, Any, Optional
 from supabase import Client
+from postgrest import ReturnMethod
 from services.supabase_client import supabase_client, get_supabase_client
 import logging
 from datetime import datetime
@@ -21,6 +22,16 @@ class JournalService:
             client.auth.set_session(access_token, refresh_token)
         return client
     
+    def _format_interaction(self, conversation_history: List[Dict]) -> List[str]:
+        """Convert conversation history to the array of strings stored on an entry"""
+        journal_interaction = []
+        for turn in conversation_history:
+            if turn.get("role") == "user":
+                journal_interaction.append(f"User: {turn.get('content', '')}")
+            elif turn.get("role") == "assistant":
+                journal_interaction.append(f"Assistant: {turn.get('content', '')}")
+        return journal_interaction
+    
     def save_entry(self, user_id: str, conversation_history: List[Dict], summary: str, 
                    access_token: Optional[str] = None, refresh_token: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -38,19 +49,11 @@ class JournalService:
         """
         try:
             client = self._get_client(access_token, refresh_token)
-            # Convert conversation history to array of strings
-            journal_interaction = []
-            for turn in conversation_history:
-                if turn.get("role") == "user":
-                    journal_interaction.append(f"User: {turn.get('content', '')}")
-                elif turn.get("role") == "assistant":
-                    journal_interaction.append(f"Assistant: {turn.get('content', '')}")
-            
             # Insert into journal_entries table
             response = client.table("journal_entries").insert({
                 "user_id": user_id,
                 "summarized_text": summary,
-                "journal_interaction": journal_interaction,
+                "journal_interaction": self._format_interaction(conversation_history),
                 "timestamp": datetime.utcnow().isoformat()
             }).execute()
             
@@ -74,6 +77,76 @@ class JournalService:
                 "error": str(e)
             }
     
+    def save_entry_with_embeddings(self, user_id: str, conversation_history: List[Dict], summary: str,
+                                   chunks: List[str], embeddings: List[List[float]],
+                                   access_token: Optional[str] = None, refresh_token: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Save a journal entry and its chunk embeddings in one transaction
+        
+        Uses the save_entry_with_embeddings Postgres function so the entry row and
+        its vectors are written in a single round trip. Falls back to separate
+        inserts if the function is not installed.
+        
+        Args:
+            user_id: ID of the user
+            conversation_history: List of conversation turns
+            summary: Summary of the conversation
+            chunks: Conversation chunks that were embedded
+            embeddings: Embedding for each chunk, in the same order
+            access_token: Optional access token for thread-local client
+            refresh_token: Optional refresh token for thread-local client
+            
+        Returns:
+            Dict containing the saved entry data and number of vectors stored
+        """
+        vectors = [
+            {"chunk_text": chunk, "embedding": embedding}
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
+        try:
+            client = self._get_client(access_token, refresh_token)
+            response = client.rpc(
+                "save_entry_with_embeddings",
+                {
+                    "p_user_id": user_id,
+                    "p_summary": summary,
+                    "p_interaction": self._format_interaction(conversation_history),
+                    "p_vectors": vectors
+                }
+            ).execute()
+            
+            entry = response.data[0] if isinstance(response.data, list) else response.data
+            if entry:
+                return {
+                    "success": True,
+                    "entry": entry,
+                    "vectors_stored": len(vectors),
+                    "message": "Entry saved successfully"
+                }
+            return {
+                "success": False,
+                "error": "Failed to save entry"
+            }
+            
+        except Exception as e:
+            logger.warning(f"save_entry_with_embeddings RPC failed, using separate inserts: {str(e)}")
+        
+        result = self.save_entry(user_id, conversation_history, summary, access_token, refresh_token)
+        if not result["success"] or not vectors:
+            return {**result, "vectors_stored": 0}
+        
+        try:
+            entry_id = result["entry"]["id"]
+            client = self._get_client(access_token, refresh_token)
+            client.table("journal_entry_vectors").insert([
+                {"entry_id": entry_id, "user_id": user_id, **vector}
+                for vector in vectors
+            ], returning=ReturnMethod.minimal).execute()
+            return {**result, "vectors_stored": len(vectors)}
+        except Exception as e:
+            logger.warning(f"Failed to store embeddings: {str(e)}")
+            return {**result, "vectors_stored": 0}
+    
     def get_user_entries(self, user_id: str, limit: int = 50, 
                          access_token: Optional[str] = None, refresh_token: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -2,9 +2,10 @@
 Neo4j service for GraphRAG - Knowledge graph storage and retrieval
 """
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from neo4j import GraphDatabase
 import logging
+from services.cache import UserTTLCache
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -17,6 +18,65 @@ logger = logging.getLogger(__name__)
 neo4j_notification_logger = logging.getLogger("neo4j.notifications")
 neo4j_notification_logger.setLevel(logging.ERROR)  # Only show errors, not warnings
 
+# Sized for gevent workers running many lookups at once; callers give up on graph
+# context after about a second, so waiting long for a pooled connection is pointless
+NEO4J_POOL_SIZE = 50
+NEO4J_ACQUISITION_TIMEOUT_SECONDS = 5
+# Connections idle longer than this are probed by the driver before reuse
+NEO4J_LIVENESS_CHECK_SECONDS = 60
+
+# Graph context per (user, entity names) is reused briefly; saving an entry invalidates it
+GRAPH_CACHE_SIZE = 10_000
+GRAPH_CACHE_TTL_SECONDS = 300
+
+# Graph context for several names at once (see get_user_graph_context_batch). Kept as
+# one constant so every call sends identical text and reuses Neo4j's cached plan
+GRAPH_CONTEXT_BATCH_QUERY = """
+    UNWIND range(0, size($names) - 1) AS position
+    CALL {
+        WITH position
+        WITH $names[position] AS query_lower
+        
+        // Entities that directly match the name, plus their 1-hop RELATES_TO neighbours
+        MATCH (matching_entity)
+        WHERE labels(matching_entity)[0] IN ['Person', 'Organization', 'Event', 'Place', 'Emotion']
+          AND matching_entity.name CONTAINS query_lower
+        OPTIONAL MATCH (matching_entity)-[:RELATES_TO]->(related_outbound)
+        OPTIONAL MATCH (related_inbound)-[:RELATES_TO]->(matching_entity)
+        WITH query_lower,
+             collect(DISTINCT matching_entity.name) AS direct_names,
+             collect(DISTINCT related_outbound.name) AS outbound_names,
+             collect(DISTINCT related_inbound.name) AS inbound_names
+        WITH query_lower, direct_names + outbound_names + inbound_names AS all_names
+        UNWIND all_names AS entity_name
+        WITH query_lower, collect(DISTINCT entity_name) AS relevant_names
+        WHERE size(relevant_names) > 0
+        
+        // Entries that mention any of these entities
+        MATCH (e:Entry {user_id: $user_id})
+        OPTIONAL MATCH (e)-[:MENTIONS]->(mentioned_entity)
+        WHERE mentioned_entity.name IN relevant_names
+        OPTIONAL MATCH (e)-[:FEELS]->(emotion:Emotion)
+        WHERE emotion.name IN relevant_names OR emotion.name CONTAINS query_lower
+        WITH e,
+             collect(DISTINCT emotion.name) AS emotions,
+             collect(DISTINCT mentioned_entity.name) AS entity_names,
+             collect(DISTINCT labels(mentioned_entity)[0]) AS entity_types,
+             e.timestamp AS timestamp
+        WHERE size(entity_names) > 0 OR size(emotions) > 0
+        RETURN DISTINCT e.id AS entry_id,
+               e.summary AS summary,
+               emotions,
+               entity_names AS entities,
+               entity_types AS types,
+               timestamp
+        ORDER BY timestamp DESC
+        LIMIT $limit
+    }
+    RETURN position, entry_id, summary, emotions, entities, types, timestamp
+    ORDER BY position
+"""
+
 class Neo4jService:
     """Service for Neo4j graph database operations"""
     
@@ -25,6 +85,7 @@ class Neo4jService:
         # Support both NEO4J_USERNAME (existing) and NEO4J_USER (guide) for backward compatibility
         self.username = os.getenv("NEO4J_USERNAME") or os.getenv("NEO4J_USER", "neo4j")
         self.password = os.getenv("NEO4J_PASSWORD")
+        self._context_cache = UserTTLCache(maxsize=GRAPH_CACHE_SIZE, ttl=GRAPH_CACHE_TTL_SECONDS)
         
         if not self.uri or not self.password:
             logger.warning("Neo4j credentials not configured. GraphRAG features will be disabled.")
@@ -52,8 +113,9 @@ class Neo4jService:
                 self.uri, 
                 auth=(self.username, self.password),
                 max_connection_lifetime=3600,  # 1 hour
-                max_connection_pool_size=10,
-                connection_acquisition_timeout=60
+                max_connection_pool_size=NEO4J_POOL_SIZE,
+                connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT_SECONDS,
+                liveness_check_timeout=NEO4J_LIVENESS_CHECK_SECONDS
             )
             # Test connection
             with self.driver.session() as session:
@@ -64,20 +126,14 @@ class Neo4jService:
             self.driver = None
     
     def _ensure_connection(self):
-        """Ensure Neo4j connection is active, reconnect if needed"""
+        """Ensure a Neo4j driver exists, creating it if an earlier connect failed
+
+        Pooled connections are liveness-checked by the driver itself, so this
+        doesn't spend a round trip on a test query before every lookup.
+        """
         if not self.driver:
             self._initialize_driver()
-            return False
-        
-        try:
-            # Test connection with a simple query
-            with self.driver.session() as session:
-                session.run("RETURN 1")
-            return True
-        except Exception as e:
-            logger.warning(f"Neo4j connection test failed, reconnecting: {str(e)}")
-            self._initialize_driver()
-            return self.driver is not None
+        return self.driver is not None
     
     def close(self):
         """Close the Neo4j driver connection"""
@@ -626,9 +682,6 @@ class Neo4jService:
                     limit=limit
                 )
                 
-                entries = []
-                context_sentences = []
-                
                 # Log raw results for debugging
                 raw_records = []
                 for record in result:
@@ -793,107 +846,7 @@ class Neo4jService:
                 except Exception as all_nodes_error:
                     logger.warning(f"Failed to query all nodes: {str(all_nodes_error)}")
                 
-                # Process the entries
-                for record in raw_records:
-                    entry_id = record.get("entry_id")
-                    summary = record.get("summary") or ""
-                    emotions = [e for e in (record.get("emotions") or []) if e]
-                    entities = [e for e in (record.get("entities") or []) if e]
-                    entity_types = [t for t in (record.get("types") or []) if t]
-                    timestamp = record.get("timestamp")
-                    
-                    if not entry_id:
-                        continue
-                    
-                    # Format timestamp for display
-                    timestamp_str = ""
-                    if timestamp:
-                        try:
-                            # Parse Neo4j datetime and format nicely
-                            if isinstance(timestamp, str):
-                                timestamp_str = timestamp[:10]  # Just the date part
-                            else:
-                                timestamp_str = str(timestamp)[:10]
-                        except:
-                            timestamp_str = ""
-                    
-                    # Build context sentence
-                    parts = []
-                    if timestamp_str:
-                        parts.append(f"On {timestamp_str}")
-                    
-                    if emotions:
-                        emotion_str = ", ".join(emotions[:2])  # Max 2 emotions
-                        if len(emotions) > 2:
-                            emotion_str += f" and {len(emotions) - 2} more"
-                        if timestamp_str:
-                            parts.append(f"you mentioned feeling {emotion_str}")
-                        else:
-                            parts.append(f"You mentioned feeling {emotion_str}")
-                    
-                    if entities:
-                        # Group entities by type for better context
-                        people = [e for e, t in zip(entities, entity_types) if t == "Person"]
-                        orgs = [e for e, t in zip(entities, entity_types) if t == "Organization"]
-                        places = [e for e, t in zip(entities, entity_types) if t == "Place"]
-                        
-                        entity_parts = []
-                        if people:
-                            people_str = ", ".join(people[:2])
-                            if len(people) > 2:
-                                people_str += f" and {len(people) - 2} more"
-                            entity_parts.append(people_str)
-                        if orgs:
-                            orgs_str = ", ".join(orgs[:2])
-                            if len(orgs) > 2:
-                                orgs_str += f" and {len(orgs) - 2} more"
-                            entity_parts.append(orgs_str)
-                        if places:
-                            places_str = ", ".join(places[:2])
-                            if len(places) > 2:
-                                places_str += f" and {len(places) - 2} more"
-                            entity_parts.append(places_str)
-                        
-                        if entity_parts:
-                            entity_str = ", ".join(entity_parts)
-                            if emotions:
-                                parts.append(f"about {entity_str}")
-                            else:
-                                if timestamp_str:
-                                    parts.append(f"you mentioned {entity_str}")
-                                else:
-                                    parts.append(f"You mentioned {entity_str}")
-                    
-                    # Combine into sentence
-                    if parts:
-                        sentence = " ".join(parts) + "."
-                        context_sentences.append(sentence)
-                    
-                    entries.append({
-                        "entry_id": entry_id,
-                        "summary": summary,
-                        "emotions": emotions,
-                        "entities": entities,
-                        "types": entity_types,
-                        "timestamp": timestamp_str if timestamp_str else None
-                    })
-                
-                # Format combined context
-                if context_sentences:
-                    # Combine multiple sentences naturally
-                    if len(context_sentences) == 1:
-                        context = context_sentences[0]
-                    elif len(context_sentences) == 2:
-                        context = f"{context_sentences[0]} {context_sentences[1]}"
-                    else:
-                        context = f"{context_sentences[0]} Also, {context_sentences[1]}"
-                        if len(context_sentences) > 2:
-                            context += f" And {len(context_sentences) - 2} more related entry{'s' if len(context_sentences) - 2 > 1 else ''}."
-                    
-                    logger.info(f"GraphRAG found {len(entries)} entries with context")
-                else:
-                    context = ""
-                    logger.debug(f"No matching entries found for query: {query_text}")
+                context, entries = self._format_graph_records(raw_records, query_text)
                 
                 return {
                     "success": True,
@@ -924,6 +877,217 @@ class Neo4jService:
                 "entries": []
             }
     
+    def get_user_graph_context_batch(self, user_id: str, names: List[str], limit_per: int = 2) -> Dict[str, Any]:
+        """
+        Get graph-based context for several entity names in one query
+        
+        Runs the same traversal as get_user_graph_context for every name inside a
+        single Cypher statement, so N entities cost one round trip instead of N.
+        
+        Args:
+            user_id: ID of the user
+            names: Entity names to find context for
+            limit_per: Maximum number of entries to return per name
+            
+        Returns:
+            Dict containing one distinct context string per name that had matches, in input order
+        """
+        if not self.driver:
+            return {
+                "success": False,
+                "error": "Neo4j not configured",
+                "contexts": [],
+                "entries": []
+            }
+        
+        query_names = list(dict.fromkeys(name.lower().strip()[:50] for name in names if name and name.strip()))
+        if not query_names:
+            return {"success": True, "contexts": [], "entries": []}
+        
+        cache_key = (user_id, tuple(query_names), limit_per)
+        cached = self._context_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            with self.driver.session() as session:
+                result = session.run(
+                    GRAPH_CONTEXT_BATCH_QUERY,
+                    user_id=user_id,
+                    names=query_names,
+                    limit=limit_per
+                )
+                
+                records_by_name: Dict[int, List[Dict[str, Any]]] = {}
+                for record in result:
+                    records_by_name.setdefault(record["position"], []).append(record.data())
+            
+            # Names that hit the same entries produce the same context; keep each once
+            contexts = []
+            entries = []
+            seen_contexts = set()
+            seen_entry_ids = set()
+            for position, query_name in enumerate(query_names):
+                context, name_entries = self._format_graph_records(records_by_name.get(position, []), query_name)
+                context_key = " ".join(context.lower().split())
+                if context_key and context_key not in seen_contexts:
+                    seen_contexts.add(context_key)
+                    contexts.append(context)
+                for entry in name_entries:
+                    if entry["entry_id"] not in seen_entry_ids:
+                        seen_entry_ids.add(entry["entry_id"])
+                        entries.append(entry)
+            
+            result = {
+                "success": True,
+                "contexts": contexts,
+                "entries": entries
+            }
+            self._context_cache.set(cache_key, result)
+            return result
+        
+        except Exception as e:
+            logger.error(f"Get user graph context batch error: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "contexts": [],
+                "entries": []
+            }
+    
+    def invalidate_user_cache(self, user_id: str):
+        """
+        Forget cached graph context for a user whose graph just changed
+        
+        Args:
+            user_id: ID of the user
+        """
+        self._context_cache.invalidate_user(user_id)
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters of the graph context cache
+        
+        Returns:
+            Dict with hits, misses, hit_rate and entries
+        """
+        return self._context_cache.stats()
+    
+    def _format_graph_records(self, raw_records: List[Dict[str, Any]], query_text: str) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Turn graph context query records into a context paragraph and entry list
+        
+        Args:
+            raw_records: Records with entry_id, summary, emotions, entities, types and timestamp
+            query_text: Query the records were found for (used in logs)
+            
+        Returns:
+            Tuple of (context string, list of entry dicts)
+        """
+        entries = []
+        context_sentences = []
+        
+        # Process the entries
+        for record in raw_records:
+            entry_id = record.get("entry_id")
+            summary = record.get("summary") or ""
+            emotions = [e for e in (record.get("emotions") or []) if e]
+            entities = [e for e in (record.get("entities") or []) if e]
+            entity_types = [t for t in (record.get("types") or []) if t]
+            timestamp = record.get("timestamp")
+
+            if not entry_id:
+                continue
+
+            # Format timestamp for display
+            timestamp_str = ""
+            if timestamp:
+                try:
+                    # Parse Neo4j datetime and format nicely
+                    if isinstance(timestamp, str):
+                        timestamp_str = timestamp[:10]  # Just the date part
+                    else:
+                        timestamp_str = str(timestamp)[:10]
+                except:
+                    timestamp_str = ""
+
+            # Build context sentence
+            parts = []
+            if timestamp_str:
+                parts.append(f"On {timestamp_str}")
+
+            if emotions:
+                emotion_str = self._join_names(emotions)  # Max 2 emotions
+                if timestamp_str:
+                    parts.append(f"you mentioned feeling {emotion_str}")
+                else:
+                    parts.append(f"You mentioned feeling {emotion_str}")
+
+            if entities:
+                # Group entities by type for better context
+                people = [e for e, t in zip(entities, entity_types) if t == "Person"]
+                orgs = [e for e, t in zip(entities, entity_types) if t == "Organization"]
+                places = [e for e, t in zip(entities, entity_types) if t == "Place"]
+
+                entity_parts = [self._join_names(names) for names in (people, orgs, places) if names]
+
+                if entity_parts:
+                    entity_str = ", ".join(entity_parts)
+                    if emotions:
+                        parts.append(f"about {entity_str}")
+                    else:
+                        if timestamp_str:
+                            parts.append(f"you mentioned {entity_str}")
+                        else:
+                            parts.append(f"You mentioned {entity_str}")
+
+            # Combine into sentence
+            if parts:
+                sentence = " ".join(parts) + "."
+                context_sentences.append(sentence)
+
+            entries.append({
+                "entry_id": entry_id,
+                "summary": summary,
+                "emotions": emotions,
+                "entities": entities,
+                "types": entity_types,
+                "timestamp": timestamp_str if timestamp_str else None
+            })
+
+        # Format combined context
+        if context_sentences:
+            # Combine multiple sentences naturally
+            if len(context_sentences) == 1:
+                context = context_sentences[0]
+            elif len(context_sentences) == 2:
+                context = f"{context_sentences[0]} {context_sentences[1]}"
+            else:
+                extra = len(context_sentences) - 2
+                context = f"{context_sentences[0]} Also, {context_sentences[1]} And {extra} more related entry{'s' if extra > 1 else ''}."
+
+            logger.info(f"GraphRAG found {len(entries)} entries with context")
+        else:
+            context = ""
+            logger.debug(f"No matching entries found for query: {query_text}")
+
+        return context, entries
+    
+    def _join_names(self, names: List[str], shown: int = 2) -> str:
+        """
+        List the first few names, counting the rest ("Sam, Alex and 3 more")
+        
+        Args:
+            names: Names to list
+            shown: Number of names to spell out
+            
+        Returns:
+            Comma-separated names
+        """
+        if len(names) <= shown:
+            return ", ".join(names)
+        return f"{', '.join(names[:shown])} and {len(names) - shown} more"
+    
     def _map_entity_type_to_label(self, entity_type: str) -> str:
         """
         Map spaCy entity types to Neo4j node labels
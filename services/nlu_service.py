@@ -3,7 +3,11 @@ NLU Service - Entity, Event, Emotion extraction and Intent classification
 Uses LLM for structured entity extraction with semantic and emotional nuance prioritization
 """
 import os
-import openai
+import re
+import hashlib
+import threading
+from cachetools import TTLCache
+from services.openai_client import get_openai_client
 from typing import List, Dict, Any, Optional
 import logging
 from dotenv import load_dotenv
@@ -13,6 +17,16 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Identical messages (client retries, resubmits, replays) reuse the earlier
+# extraction instead of repeating two LLM calls
+NLU_CACHE_SIZE = 4096
+NLU_CACHE_TTL_SECONDS = 10 * 60
+NLU_CACHE_MAX_TEXT_CHARS = 2000
+
+# Intent labels the classifier may answer with; the pattern finds one inside a wordier reply
+VALID_INTENTS = ("self-reflection", "planning", "emotional-release", "insight-generation", "general")
+INTENT_LABEL_RE = re.compile("|".join(re.escape(intent) for intent in VALID_INTENTS))
+
 # Try to import spaCy, but handle gracefully if not installed
 try:
     import spacy
@@ -38,9 +52,12 @@ class NLUService:
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY must be set in environment variables")
         
-        openai.api_key = self.api_key
+        self.openai_client = get_openai_client()
         
         self.nlp = nlp  # Will be None if spaCy not available or model not loaded
+        
+        self._cache = TTLCache(maxsize=NLU_CACHE_SIZE, ttl=NLU_CACHE_TTL_SECONDS)
+        self._cache_lock = threading.Lock()
     
     def _extract_json_from_response(self, response_text: str) -> str:
         """
@@ -189,7 +206,7 @@ Text: {text[:2000]}
 
 Return ONLY the JSON object, no markdown, no code blocks, no other text:"""
             
-            response = openai.chat.completions.create(
+            response = self.openai_client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "You are an expert in reflective journaling entity extraction. Return ONLY a valid JSON object (not an array). Do not use markdown code blocks. Return the raw JSON object starting with { and ending with }."},
@@ -365,6 +382,32 @@ Return ONLY the JSON object, no markdown, no code blocks, no other text:"""
                     logger.error(f"spaCy fallback error: {str(e2)}")
             return []
     
+    def _normalize_emotions(self, emotions: List[Any]) -> List[Dict]:
+        """
+        Bring extracted emotions into one dict shape so consumers can index fields directly
+        
+        Args:
+            emotions: Emotions as returned by the LLM: dicts, or bare names in the old format
+            
+        Returns:
+            List of emotions with type, valence, intensity and value; unusable items are dropped
+        """
+        normalized = []
+        for emotion in emotions or []:
+            if isinstance(emotion, str):
+                emotion = {"type": emotion}
+            elif not isinstance(emotion, dict):
+                continue
+            valence = emotion.get("valence", "neutral")
+            intensity = emotion.get("intensity", 3)
+            normalized.append({
+                "type": emotion.get("type", ""),
+                "valence": valence,
+                "intensity": intensity,
+                "value": f"{valence} intensity {intensity}/5"  # Backward compat
+            })
+        return normalized
+    
     def extract_emotions(self, text: str) -> List[Dict]:
         """
         Extract emotions from text using LLM with valence and intensity
@@ -381,20 +424,7 @@ Return ONLY the JSON object, no markdown, no code blocks, no other text:"""
             emotions = graph_data.get("emotions", [])
             
             # Convert to backward-compatible format if needed
-            formatted_emotions = []
-            for emotion in emotions:
-                if isinstance(emotion, dict):
-                    formatted_emotions.append({
-                        "type": emotion.get("type", ""),
-                        "valence": emotion.get("valence", "neutral"),
-                        "intensity": emotion.get("intensity", 3),
-                        "value": f"{emotion.get('valence', 'neutral')} intensity {emotion.get('intensity', 3)}/5"  # Backward compat
-                    })
-                else:
-                    # Fallback for old format
-                    formatted_emotions.append(emotion)
-            
-            return formatted_emotions
+            return self._normalize_emotions(emotions)
             
         except Exception as e:
             logger.error(f"Extract emotions error: {str(e)}")
@@ -421,7 +451,7 @@ Return ONLY a JSON array, no other text. Example format:
 
 Events:"""
             
-            response = openai.chat.completions.create(
+            response = self.openai_client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant that extracts events from text. Return only valid JSON."},
@@ -480,7 +510,7 @@ Return ONLY a JSON array, no other text. Example format:
 
 Relationships:"""
             
-            response = openai.chat.completions.create(
+            response = self.openai_client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant that infers relationships between entities. Return only valid JSON."},
@@ -532,7 +562,7 @@ Text: {text[:1000]}
 
 Return ONLY the category name, nothing else. Category:"""
             
-            response = openai.chat.completions.create(
+            response = self.openai_client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant that classifies journal entry intents. Return only the category name."},
@@ -544,16 +574,11 @@ Return ONLY the category name, nothing else. Category:"""
             
             intent = response.choices[0].message.content.strip().lower()
             
-            # Validate intent
-            valid_intents = ["self-reflection", "planning", "emotional-release", "insight-generation", "general"]
-            if intent in valid_intents:
+            # Validate intent, matching a label inside e.g. '"planning".' or 'category: planning'
+            if intent in VALID_INTENTS:
                 return intent
-            else:
-                # Try to match partial
-                for valid_intent in valid_intents:
-                    if valid_intent in intent:
-                        return valid_intent
-                return "general"
+            match = INTENT_LABEL_RE.search(intent)
+            return match.group(0) if match else "general"
                 
         except Exception as e:
             logger.error(f"Classify intent error: {str(e)}")
@@ -561,7 +586,7 @@ Return ONLY the category name, nothing else. Category:"""
     
     def process_text(self, text: str) -> Dict[str, Any]:
         """
-        Complete NLU processing pipeline
+        Complete NLU processing pipeline, memoized briefly per text
         
         Args:
             text: Text to process
@@ -569,6 +594,26 @@ Return ONLY the category name, nothing else. Category:"""
         Returns:
             Dict with entities, events, emotions, intent, and relationships
         """
+        # Whole saved conversations are too long to be repeated; only messages are memoized
+        cache_key = None
+        if len(text) <= NLU_CACHE_MAX_TEXT_CHARS:
+            cache_key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+            with self._cache_lock:
+                cached = self._cache.get(cache_key)
+            if cached is not None:
+                logger.info("NLU cache hit")
+                return cached
+        
+        result = self._process_text(text)
+        
+        # Failed extractions come back empty; don't pin them for the TTL
+        if cache_key is not None and any(result["graph_data"].values()):
+            with self._cache_lock:
+                self._cache[cache_key] = result
+        return result
+    
+    def _process_text(self, text: str) -> Dict[str, Any]:
+        """Run graph extraction and intent classification for a text (uncached)"""
         # Use LLM-based graph extraction ONCE for comprehensive extraction
         graph_data = self.extract_graph_entities(text)
         
@@ -620,17 +665,7 @@ Return ONLY the category name, nothing else. Category:"""
             })
         
         # Extract emotions from graph_data (no additional LLM call)
-        emotions = []
-        for emotion in graph_data.get("emotions", []):
-            if isinstance(emotion, dict):
-                emotions.append({
-                    "type": emotion.get("type", ""),
-                    "valence": emotion.get("valence", "neutral"),
-                    "intensity": emotion.get("intensity", 3),
-                    "value": f"{emotion.get('valence', 'neutral')} intensity {emotion.get('intensity', 3)}/5"  # Backward compat
-                })
-            else:
-                emotions.append(emotion)
+        emotions = self._normalize_emotions(graph_data.get("emotions", []))
         
         # Extract events from graph data (already in graph_data)
         events = [{"name": event} for event in graph_data.get("events", [])]
@@ -0,0 +1,41 @@
+"""
+OpenAI client configuration and initialization
+"""
+import os
+import importlib.util
+import httpx
+from openai import OpenAI
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Shared client so every service reuses one pooled, keep-alive connection set
+_client = None
+
+def get_openai_client() -> OpenAI:
+    """
+    Get the shared OpenAI client instance.
+
+    The underlying httpx pool keeps TCP/TLS connections alive across calls and
+    negotiates HTTP/2 when the optional ``h2`` package is installed.
+
+    The client is synchronous on purpose: under the gevent workers started from
+    wsgi.py its socket reads yield to other greenlets, so one worker already keeps
+    many requests in flight over this pool without an AsyncOpenAI event loop.
+    """
+    global _client
+    if _client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY must be set in environment variables")
+
+        http_client = httpx.Client(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+            timeout=httpx.Timeout(60.0, connect=5.0)
+        )
+        _client = OpenAI(api_key=api_key, http_client=http_client, max_retries=2)
+
+    return _client
@@ -1,21 +1,48 @@
 """
 RAG (Retrieval-Augmented Generation) service for context retrieval
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import hashlib
 import logging
+from services.cache import UserTTLCache
 from services.embedding_service import embedding_service
 from services.journal_service import journal_service
+from services.semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
+# Recent retrievals are memoized briefly so repeated short replies ("ok", "go on")
+# don't trigger another embedding request and vector search
+RAG_CACHE_SIZE = 10_000
+RAG_CACHE_TTL_SECONDS = 300
+RAG_CACHE_MAX_QUERY_CHARS = 400
+
 class RAGService:
     """Service for retrieval-augmented generation"""
     
     def __init__(self):
         self.embedding_service = embedding_service
         self.journal_service = journal_service
+        self._cache = UserTTLCache(maxsize=RAG_CACHE_SIZE, ttl=RAG_CACHE_TTL_SECONDS)
+        # Reworded repeats ("I'm anxious" / "I feel anxious today") reuse the same
+        # retrieval instead of running another vector search
+        self.semantic_cache = SemanticCache(ttl_seconds=RAG_CACHE_TTL_SECONDS)
+    
+    def _cache_key(self, user_id: str, current_message: str, limit: int) -> Optional[Tuple[str, bytes, int]]:
+        """Build the memo key for a query, or None if it's too long to be worth caching"""
+        normalized = current_message.lower().strip()
+        if len(normalized) > RAG_CACHE_MAX_QUERY_CHARS:
+            return None
+        digest = hashlib.blake2s(normalized.encode(), digest_size=16).digest()
+        return (user_id, digest, limit)
     
-    def get_relevant_context(self, user_id: str, current_message: str, limit: int = 3) -> Dict[str, Any]:
+    def get_relevant_context(
+        self,
+        user_id: str,
+        current_message: str,
+        limit: int = 3,
+        query_embedding: Optional[List[float]] = None
+    ) -> Dict[str, Any]:
         """
         Get relevant context from past entries for the current message
         
@@ -23,37 +50,66 @@ class RAGService:
             user_id: ID of the user
             current_message: Current user message
             limit: Maximum number of relevant entries to return
+            query_embedding: Embedding of current_message, if the caller already has one
             
         Returns:
             Dict containing relevant context
         """
+        cache_key = self._cache_key(user_id, current_message, limit)
+        if cache_key is not None:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                logger.info("RAG cache hit for user %s", user_id)
+                return cached
+        
         try:
+            if query_embedding is None:
+                try:
+                    query_embedding = self.embedding_service.generate_embedding(current_message)
+                except Exception:
+                    # search_similar_entries retries and falls back to text search
+                    query_embedding = None
+
+            semantic_key = f"{user_id}:{limit}"
+            if query_embedding is not None:
+                cached = self.semantic_cache.get(semantic_key, query_embedding)
+                if cached is not None:
+                    logger.info("RAG semantic cache hit for user %s", user_id)
+                    return cached
+
             # Search for similar entries using vector similarity
             search_result = self.embedding_service.search_similar_entries(
                 user_id=user_id,
                 query_text=current_message,
-                limit=limit
+                limit=limit,
+                query_embedding=query_embedding
             )
 
-            logger.info(f"Search result: {search_result}")
+            logger.debug("Search result: %s", search_result)
             
             if search_result["success"] and search_result["results"]:
                 # Format the context for the LLM
                 formatted_context = self.format_context_for_prompt(search_result["results"])
                 
-                return {
+                result = {
                     "success": True,
                     "context": formatted_context,
                     "relevant_entries": search_result["results"],
                     "count": len(search_result["results"])
                 }
             else:
-                return {
+                result = {
                     "success": True,
                     "context": "",
                     "relevant_entries": [],
                     "count": 0
                 }
+            
+            if cache_key is not None and search_result["success"]:
+                self._cache.set(cache_key, result)
+            if query_embedding is not None and search_result["success"]:
+                self.semantic_cache.set(semantic_key, query_embedding, result)
+            return result
                 
         except Exception as e:
             logger.error(f"Get relevant context error: {str(e)}")
@@ -64,6 +120,25 @@ class RAGService:
                 "relevant_entries": []
             }
     
+    def invalidate_user_cache(self, user_id: str):
+        """
+        Forget memoized retrievals for a user whose entries just changed
+        
+        Args:
+            user_id: ID of the user
+        """
+        self._cache.invalidate_user(user_id)
+        self.semantic_cache.clear_namespaces(f"{user_id}:")
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters of the retrieval caches
+        
+        Returns:
+            Dict with stats for the exact-match and semantic caches
+        """
+        return {"exact": self._cache.stats(), "semantic": self.semantic_cache.stats()}
+    
     def format_context_for_prompt(self, entries: List[Dict]) -> str:
         """
         Format retrieved entries for inclusion in the LLM prompt
@@ -98,9 +173,11 @@ class RAGService:
             context_parts.append(f"- {formatted_time}: {content}")
         
         if context_parts:
-            context = "You previously discussed with this user:\n" + "\n".join(context_parts)
-            context += "\n\nUse this context subtly and naturally in your response, but don't over-reference it."
-            return context
+            return (
+                "You previously discussed with this user:\n"
+                + "\n".join(context_parts)
+                + "\n\nUse this context subtly and naturally in your response, but don't over-reference it."
+            )
         
         return ""
     
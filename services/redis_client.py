@@ -0,0 +1,36 @@
+"""
+Redis client configuration and initialization
+"""
+import os
+from typing import Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Redis is optional; features that use it fall back to in-process state when unset
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+_client = None
+
+def get_redis_client() -> Optional["redis.Redis"]:
+    """
+    Get the shared Redis client instance.
+
+    Returns None when REDIS_URL is not set or the redis package is not installed.
+    """
+    global _client
+    if _client is None:
+        url = os.getenv("REDIS_URL")
+
+        if not url or not REDIS_AVAILABLE:
+            return None
+
+        _client = redis.Redis.from_url(url, health_check_interval=30)
+
+    return _client
@@ -0,0 +1,132 @@
+"""
+Semantic cache for reusing results of near-duplicate queries
+"""
+from typing import Any, Dict, Optional, List
+import threading
+import time
+import numpy as np
+
+# "I'm anxious" and "I feel anxious today" embed almost identically; unrelated
+# messages from the same user rarely score above this
+SEMANTIC_CACHE_MIN_SIMILARITY = 0.95
+SEMANTIC_CACHE_TTL_SECONDS = 300
+SEMANTIC_CACHE_MAX_ENTRIES_PER_KEY = 64
+SEMANTIC_CACHE_MAX_NAMESPACES = 10_000
+
+class SemanticCache:
+    """Cache of values keyed by query embedding, matched by cosine similarity within a namespace"""
+
+    def __init__(
+        self,
+        min_similarity: float = SEMANTIC_CACHE_MIN_SIMILARITY,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES_PER_KEY
+    ):
+        self.min_similarity = min_similarity
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # namespace -> {"vectors": unit-length rows, "values": [...], "expires": [...]}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _unit(self, embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _evict_expired(self, bucket: Dict[str, Any], now: float):
+        keep = [i for i, expires in enumerate(bucket["expires"]) if expires > now]
+        if len(keep) != len(bucket["expires"]):
+            bucket["vectors"] = bucket["vectors"][keep]
+            bucket["values"] = [bucket["values"][i] for i in keep]
+            bucket["expires"] = [bucket["expires"][i] for i in keep]
+
+    def get(self, namespace: str, embedding: List[float]) -> Optional[Any]:
+        """
+        Get the value cached for the most similar earlier query, if it is similar enough
+
+        Args:
+            namespace: Cache partition, e.g. a user ID
+            embedding: Embedding of the current query
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        query = self._unit(embedding)
+        with self._lock:
+            bucket = self._entries.get(namespace)
+            if bucket:
+                self._evict_expired(bucket, time.monotonic())
+            if not bucket or not bucket["values"]:
+                self.misses += 1
+                return None
+
+            scores = bucket["vectors"] @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.min_similarity:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return bucket["values"][best]
+
+    def set(self, namespace: str, embedding: List[float], value: Any):
+        """
+        Cache a value for a query embedding, evicting the oldest entries past the size cap
+
+        Args:
+            namespace: Cache partition, e.g. a user ID
+            embedding: Embedding of the query
+            value: Value to return for similar queries
+        """
+        vector = self._unit(embedding)[np.newaxis, :]
+        expires = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            bucket = self._entries.get(namespace)
+            if not bucket or not bucket["values"]:
+                if namespace not in self._entries and len(self._entries) >= SEMANTIC_CACHE_MAX_NAMESPACES:
+                    # Drop the namespace created longest ago
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[namespace] = {"vectors": vector, "values": [value], "expires": [expires]}
+                return
+            bucket["vectors"] = np.vstack([bucket["vectors"], vector])[-self.max_entries:]
+            bucket["values"] = (bucket["values"] + [value])[-self.max_entries:]
+            bucket["expires"] = (bucket["expires"] + [expires])[-self.max_entries:]
+
+    def discard(self, namespace: str):
+        """
+        Drop everything cached in a namespace
+
+        Args:
+            namespace: Cache partition, e.g. a user ID
+        """
+        with self._lock:
+            self._entries.pop(namespace, None)
+
+    def clear_namespaces(self, prefix: str):
+        """
+        Drop every namespace whose name starts with a prefix
+
+        Args:
+            prefix: Namespace prefix, e.g. "<user_id>:"
+        """
+        with self._lock:
+            for namespace in [namespace for namespace in self._entries if namespace.startswith(prefix)]:
+                del self._entries[namespace]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters for monitoring
+
+        Returns:
+            Dict with hits, misses, hit_rate and the number of namespaces held
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "namespaces": len(self._entries)
+            }
@@ -0,0 +1,49 @@
+"""
+Singleflight helper for coalescing identical in-flight calls
+"""
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+import threading
+
+class SingleFlight:
+    """Runs a function once per key at a time; callers that arrive while it runs share its result"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call fn, or wait for the call already running under the same key
+
+        Args:
+            key: Identity of the call; equal keys must mean interchangeable results
+            fn: Function to run
+            *args: Positional arguments for fn
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The result of fn. Exceptions raised by fn are raised to every waiting caller.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            # BaseException too, so a killed greenlet doesn't leave waiters hanging
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
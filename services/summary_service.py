@@ -1,8 +1,8 @@
 """
 Summary service for generating conversation summaries using GPT
 """
-from typing import List, Dict, Any
-import openai
+from typing import List, Dict, Any, Optional
+from services.openai_client import get_openai_client
 import os
 import logging
 from dotenv import load_dotenv
@@ -22,14 +22,15 @@ class SummaryService:
             raise ValueError("OPENAI_API_KEY must be set in environment variables")
         
         # Initialize OpenAI client
-        openai.api_key = self.api_key
+        self.openai_client = get_openai_client()
     
-    def generate_summary(self, conversation_history: List[Dict]) -> str:
+    def generate_summary(self, conversation_history: List[Dict], earlier_summary: str = "") -> str:
         """
         Generate a summary of the conversation
         
         Args:
             conversation_history: List of conversation turns
+            earlier_summary: Running summary of turns already rolled out of the history
             
         Returns:
             Summary string
@@ -37,6 +38,8 @@ class SummaryService:
         try:
             # Format conversation for summarization
             conversation_text = self._format_conversation_for_summary(conversation_history)
+            if earlier_summary:
+                conversation_text = f"(Earlier in this conversation: {earlier_summary})\n{conversation_text}"
             
             # Create summary prompt
             summary_prompt = f"""Please summarize this journaling conversation in 2-3 sentences, capturing the key themes, emotions, and insights discussed. Focus on what the user shared about their thoughts, feelings, or experiences.
@@ -47,7 +50,7 @@ Conversation:
 Summary:"""
             
             # Generate summary using GPT
-            response = openai.chat.completions.create(
+            response = self.openai_client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant that creates concise, empathetic summaries of journaling conversations."},
@@ -70,6 +73,46 @@ Summary:"""
             # Fallback to a simple summary
             return self._create_fallback_summary(conversation_history)
     
+    def update_running_summary(self, previous_summary: str, turns: List[Dict]) -> Optional[str]:
+        """
+        Fold older conversation turns into the running summary of the current session
+        
+        Args:
+            previous_summary: Running summary so far (may be empty)
+            turns: Conversation turns being rolled out of the raw history
+            
+        Returns:
+            Updated summary string, or None if the summary could not be generated
+        """
+        try:
+            conversation_text = self._format_conversation_for_summary(turns)
+            
+            rollup_prompt = f"""Summarize this journal chat so far in <=150 tokens, preserving emotions, topics, names.
+
+Summary so far:
+{previous_summary or "(none)"}
+
+New conversation:
+{conversation_text}
+
+Updated summary:"""
+            
+            response = self.openai_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant that keeps a compact running summary of a journaling conversation."},
+                    {"role": "user", "content": rollup_prompt}
+                ],
+                max_tokens=200,
+                temperature=0.3
+            )
+            
+            return response.choices[0].message.content.strip()
+            
+        except Exception as e:
+            logger.error(f"Update running summary error: {str(e)}")
+            return None
+    
     def _format_conversation_for_summary(self, conversation_history: List[Dict]) -> str:
         """
         Format conversation history for summarization
@@ -147,7 +190,7 @@ Summary:"""
 
 Title:"""
             
-            response = openai.chat.completions.create(
+            response = self.openai_client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant that creates short, descriptive titles for journal entries."},
@@ -0,0 +1,39 @@
+"""
+Phase timers for measuring where a request spends its time
+"""
+from typing import Any, Callable, Dict
+import time
+
+class PhaseTimer:
+    """Context manager that records how long its block took as metrics["t_<name>_ms"]"""
+
+    def __init__(self, metrics: Dict[str, Any], name: str):
+        self.metrics = metrics
+        self.name = name
+        self._start = 0.0
+
+    def __enter__(self) -> "PhaseTimer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        # Recorded on errors too, so a failing phase still shows how long it took
+        self.metrics[f"t_{self.name}_ms"] = round((time.perf_counter() - self._start) * 1000, 1)
+        return False
+
+def timed(metrics: Dict[str, Any], name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Call fn and record its duration, e.g. inside a worker thread
+
+    Args:
+        metrics: Dict to record the duration in
+        name: Phase name
+        fn: Function to run
+        *args: Positional arguments for fn
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        The result of fn
+    """
+    with PhaseTimer(metrics, name):
+        return fn(*args, **kwargs)
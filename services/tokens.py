@@ -0,0 +1,194 @@
+"""
+Token counting helpers for budgeting prompt size
+"""
+from typing import Dict, Iterable, List
+from functools import lru_cache
+import os
+import logging
+import tiktoken
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Chat models used by the app share the cl100k_base encoding
+try:
+    _encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+except KeyError:
+    _encoding = tiktoken.get_encoding("cl100k_base")
+
+# Per-message framing tokens added by the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Default budget for conversation history included in a chat prompt; read once
+# from HISTORY_TOKENS at import so it can be tuned per deployment without a code change
+DEFAULT_HISTORY_TOKENS = 1500
+# Smallest accepted budget: room for at least one capped earlier turn
+MIN_HISTORY_TOKENS = 200
+
+def _history_tokens_from_env() -> int:
+    """
+    Read the history token budget from HISTORY_TOKENS
+
+    Returns:
+        The configured budget, DEFAULT_HISTORY_TOKENS if unset or not a number,
+        and never less than MIN_HISTORY_TOKENS
+    """
+    value = os.getenv("HISTORY_TOKENS", "").strip()
+    if not value:
+        return DEFAULT_HISTORY_TOKENS
+    try:
+        budget = int(value)
+    except ValueError:
+        logger.warning(f"HISTORY_TOKENS={value!r} is not a whole number, using {DEFAULT_HISTORY_TOKENS}")
+        return DEFAULT_HISTORY_TOKENS
+    if budget < MIN_HISTORY_TOKENS:
+        logger.warning(f"HISTORY_TOKENS={budget} is below the minimum, using {MIN_HISTORY_TOKENS}")
+        return MIN_HISTORY_TOKENS
+    return budget
+
+MAX_HISTORY_TOKENS = _history_tokens_from_env()
+
+# Default budget for retrieved past-entry context sent with a single turn
+MAX_CONTEXT_TOKENS = 600
+
+# Share of that context budget for knowledge-graph snippets, which are packed
+# before the combined context is trimmed
+MAX_GRAPH_CONTEXT_TOKENS = 200
+
+# Longest a single earlier turn may be when replayed as history; long journal
+# passages are cut so a few of them can't crowd every other turn out of the budget
+MAX_HISTORY_MESSAGE_TOKENS = 150
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """
+    Count tokens in a piece of text
+
+    Results are memoized by text, so history messages that are re-counted on
+    every turn are only encoded once.
+
+    Args:
+        text: Text to count
+
+    Returns:
+        Number of tokens
+    """
+    return len(_encoding.encode(text))
+
+def count_message_tokens(messages: Iterable[Dict]) -> int:
+    """
+    Estimate the prompt tokens used by a list of chat messages
+
+    Args:
+        messages: Chat messages with a "content" field
+
+    Returns:
+        Estimated number of tokens
+    """
+    return sum(count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+@lru_cache(maxsize=1024)
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut a text to at most max_tokens tokens
+
+    Args:
+        text: Text to shorten
+        max_tokens: Token budget for the returned text
+
+    Returns:
+        The text unchanged if it fits, otherwise its leading tokens followed by "…"
+    """
+    tokens = _encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return _encoding.decode(tokens[:max_tokens - 1]).rstrip() + "…"
+
+def cap_message_tokens(messages: List[Dict], max_tokens: int) -> List[Dict]:
+    """
+    Shorten any message longer than a per-message token budget
+
+    Args:
+        messages: Chat messages with a "content" field
+        max_tokens: Token budget for each message
+
+    Returns:
+        The messages, with over-long ones replaced by truncated copies
+    """
+    return [
+        message if count_tokens(message.get("content", "")) <= max_tokens
+        else {**message, "content": truncate_to_tokens(message["content"], max_tokens)}
+        for message in messages
+    ]
+
+def trim_to_token_budget(messages: List[Dict], max_tokens: int) -> List[Dict]:
+    """
+    Keep the most recent messages that fit within a token budget
+
+    Walks the history from newest to oldest and stops at the first message that
+    would exceed the budget, so the result is always a contiguous tail.
+
+    Args:
+        messages: Chat messages in chronological order
+        max_tokens: Token budget for the returned messages
+
+    Returns:
+        The newest messages that fit, in chronological order
+    """
+    total = 0
+    start = len(messages)
+    for index in range(len(messages) - 1, -1, -1):
+        total += count_tokens(messages[index].get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+        if total > max_tokens:
+            break
+        start = index
+    return messages[start:]
+
+def trim_lines_to_token_budget(text: str, max_tokens: int) -> str:
+    """
+    Keep the leading lines of a text that fit within a token budget
+
+    Args:
+        text: Newline-separated text, most important lines first
+        max_tokens: Token budget for the returned text
+
+    Returns:
+        The text truncated at a line boundary
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    kept = []
+    total = 0
+    for line in text.split("\n"):
+        total += count_tokens(line) + 1
+        if total > max_tokens:
+            break
+        kept.append(line)
+    return "\n".join(kept)
+
+def pack_to_token_budget(texts: Iterable[str], max_tokens: int) -> List[str]:
+    """
+    Greedily keep texts, in order, while they fit within a token budget
+
+    Texts too long for the remaining budget are skipped, so shorter ones after
+    them can still be packed.
+
+    Args:
+        texts: Candidate texts, most important first
+        max_tokens: Token budget for the returned texts
+
+    Returns:
+        The texts that fit, in their original order
+    """
+    packed = []
+    total = 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if total + tokens <= max_tokens:
+            packed.append(text)
+            total += tokens
+    return packed
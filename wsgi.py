@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+"""
+Goldfish WSGI entry point for production
+Run with gunicorn's gevent worker: gunicorn -k gevent wsgi:app
+"""
+
+# Patch sockets, ssl and threading before anything else imports them so the
+# blocking OpenAI, Supabase and Neo4j calls yield to other greenlets
+from gevent import monkey
+monkey.patch_all()
+
+from app import app  # noqa: E402
+
+if __name__ == "__main__":
+    app.run()